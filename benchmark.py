@@ -0,0 +1,361 @@
+#/usr/bin/env python
+#
+# Benchmark
+#
+# Timing harness for the games.py engine. Runs headless (SDL's dummy
+# video and audio drivers) so it can be used on a build machine as
+# well as on the cabinet itself.
+#
+# Usage: python benchmark.py [name ...]
+#
+# With no names, every benchmark is run.
+
+"""Benchmarks for PyArcade's engine."""
+
+import os
+
+import sys
+
+import random
+
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from utility import games, assets
+
+FALLING_OBJECTS = "graphics/phone/falling_objects.png"
+
+
+def _timeit(function, repeats):
+    """Return the average time (in microseconds) of a call to function."""
+    start = time.perf_counter()
+    for i in range(repeats):
+        function()
+    return (time.perf_counter() - start) * 1e6 / repeats
+
+
+def _falling_images():
+    """Load the Save the Phone falling object images."""
+    return games.load_atlas(FALLING_OBJECTS).images()
+
+
+def _brute_force_overlaps(sprite):
+    """The overlap query as it was done before the spatial hash."""
+    objects = games.screen.all_objects
+    indices = sprite._rect.collidelistall([obj._rect for obj in objects])
+    return [objects[i] for i in indices
+            if objects[i].is_collideable and objects[i] is not sprite]
+
+
+def bench_overlap(counts=(25, 50, 100, 200, 400, 800), queries=2000):
+    """
+    Cost of the phone's overlapping_sprites query as Save the Phone
+    scales to hundreds of falling objects.
+
+    Objects are spread over a column that grows with their number (the
+    way a long stream of falling objects would be), so the density
+    around the phone stays the same and only the total count changes.
+    """
+    images = _falling_images()
+    phone_image = games.load_image("graphics/phone/phone_happy.png")
+
+    print("overlap: phone.overlapping_sprites, %d queries" % queries)
+    print("%8s %14s %14s" % ("sprites", "grid (us)", "brute (us)"))
+    random.seed(0)
+    for count in counts:
+        games.screen.clear()
+        phone = games.Sprite(image=phone_image,
+                             x=games.screen.width/2,
+                             bottom=games.screen.height - 35)
+        games.screen.add(phone)
+        height = games.screen.height * count // 25
+        for i in range(count):
+            games.screen.add(games.Sprite(image=random.choice(images),
+                                          x=random.randrange(580),
+                                          y=games.screen.height - random.randrange(height)))
+
+        # Both queries must agree before their timings mean anything.
+        assert (set(phone.overlapping_sprites) ==
+                set(_brute_force_overlaps(phone)))
+
+        grid = _timeit(lambda: phone.overlapping_sprites, queries)
+        brute = _timeit(lambda: _brute_force_overlaps(phone), queries)
+        print("%8d %14.2f %14.2f" % (count, grid, brute))
+    games.screen.clear()
+
+
+def _scan_for_object_above(game):
+    """Save the Phone's per-frame search as it was before the type index."""
+    for sprite in games.screen.all_objects:
+        if sprite not in (game.mobile, game.initial_msg):
+            if sprite.right >= game.mobile.left and sprite.right <= game.mobile.right:
+                if game.object_above_phone == None:
+                    game.object_above_phone = sprite
+
+
+def bench_phone_frame(counts=(0, 50, 100, 200, 400), frames=2000):
+    """
+    Cost of one Save the Phone Game.update() call (the per-frame game
+    logic) with a fixed number of falling objects and a growing number
+    of unrelated sprites (messages and explosions).
+    """
+    import phone
+
+    # Build the game by hand: Game() would also load its music.
+    game = phone.Game.__new__(phone.Game)
+    game.score = 0
+    game.object_above_phone = None
+
+    print("phone_frame: Game.update() with 20 falling objects, %d frames" % frames)
+    print("%10s %14s %14s" % ("unrelated", "index (us)", "scan (us)"))
+    random.seed(0)
+    for count in counts:
+        games.screen.clear()
+        game.mobile = phone.Phone(game)
+        game.initial_msg = games.Text(value="Random objects are falling!",
+                                      size=30, color=(255, 255, 255))
+        games.screen.add(game.mobile)
+        games.screen.add(game.initial_msg)
+        for i in range(20):
+            games.screen.add(phone.FallingObject(game))
+        for i in range(count):
+            games.screen.add(games.Sprite(image=game.initial_msg.image,
+                                          x=random.randrange(games.screen.width),
+                                          y=random.randrange(games.screen.height),
+                                          is_collideable=False))
+
+        # Never spawn while timing; only the search is measured.
+        game._count = frames * 10
+
+        index = _timeit(game.update, frames)
+        scan = _timeit(lambda: _scan_for_object_above(game), frames)
+        print("%10d %14.2f %14.2f" % (count, index, scan))
+    games.screen.clear()
+
+
+def bench_redraw(counts=(10, 50, 100, 200, 400), frames=300):
+    """
+    Cost of repainting the display (Screen._redraw) when every sprite
+    moves every frame, the worst case for the change tracking.
+    """
+    images = _falling_images()
+
+    print("redraw: every sprite moving, %d frames" % frames)
+    print("%8s %14s %16s" % ("sprites", "frame (us)", "per sprite (us)"))
+    random.seed(0)
+    for count in counts:
+        games.screen.clear()
+        sprites = []
+        for i in range(count):
+            sprite = games.Sprite(image=random.choice(images),
+                                  x=random.randrange(games.screen.width),
+                                  y=random.randrange(games.screen.height))
+            games.screen.add(sprite)
+            sprites.append(sprite)
+        games.screen._redraw()
+
+        def frame():
+            for sprite in sprites:
+                sprite.x = (sprite.x + 1) % games.screen.width
+            games.screen._redraw()
+            games.screen._dirtyrects = []
+
+        cost = _timeit(frame, frames)
+        print("%8d %14.2f %16.2f" % (count, cost, cost / count))
+    games.screen.clear()
+
+
+def _manifest_files(manifest):
+    """Every file a manifest makes preload_assets read."""
+    filenames = []
+    for kind, names in manifest.items():
+        if kind == "music":
+            continue
+        filenames.extend(names)
+        if kind == "atlases":
+            filenames.extend([os.path.splitext(name)[0] + ".txt" for name in names])
+    return filenames
+
+
+def _drop_file_cache(filenames):
+    """
+    Ask the OS to forget the cached contents of the files, so that the
+    next read comes from the disk. Returns False where that can't be done.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for filename in filenames:
+        fd = os.open(filename, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def bench_startup(workers=(1, 2, 4, 8), runs=5):
+    """
+    Time to load every asset in the arcade (assets.ARCADE) with
+    preload_assets, serially (1 worker) and with a pool of decoding
+    threads, starting from a cold file cache each time where the OS
+    allows it. Uses loose files, never the asset archive.
+    """
+    manifest = assets.ARCADE
+    filenames = _manifest_files(manifest)
+    cold = _drop_file_cache(filenames)
+    archive, games.archive = games.archive, None
+
+    print("startup: preload_assets(assets.ARCADE), %d files, best of %d, %d CPUs (%s file cache)" %
+          (len(filenames), runs, os.cpu_count() or 1, cold and "cold" or "warm"))
+    print("%8s %14s %10s" % ("workers", "time (ms)", "speedup"))
+    serial = None
+    for count in workers:
+        best = None
+        for i in range(runs):
+            games.image_cache.clear()
+            games.sound_bank.unload(manifest["sounds"])
+            _drop_file_cache(filenames)
+            start = time.perf_counter()
+            games.preload_assets(manifest, count)
+            elapsed = (time.perf_counter() - start) * 1e3
+            best = min(best or elapsed, elapsed)
+        serial = serial or best
+        print("%8d %14.2f %9.2fx" % (count, best, serial / best))
+    games.archive = archive
+    games.image_cache.clear()
+    games.sound_bank.unload(manifest["sounds"])
+
+
+def bench_blit_formats(size=96, blits=2000):
+    """
+    Blit throughput of each kind of image in each format it can be
+    stored in, on this display (what games.calibrate_formats measures).
+    """
+    print("blit_formats: %dx%d images, %d blits, %d-bit display" %
+          (size, size, blits, games.screen.display.get_bitsize()))
+    print("%10s %14s %12s" % ("kind", "format", "blit (us)"))
+    chosen = dict(games.blit_formats)
+    timings = games.calibrate_formats(size, blits)
+    for kind in sorted(timings):
+        for format in games.BLIT_FORMATS[kind]:
+            print("%10s %14s %12.2f%s" % (kind, format, timings[kind][format],
+                                         format == games.blit_formats[kind] and " *" or ""))
+    games.blit_formats.update(chosen)
+
+
+def bench_memory():
+    """
+    Memory held by assets once every game has been imported (and its
+    class bodies have loaded their images and sounds). Run it with
+    PYARCADE_LOW_MEMORY=1 to see the low-memory mode's savings.
+    """
+    from utility import registry
+
+    for game in registry.GAMES:
+        game.load()
+    groups = dict([(game.title, game.manifest) for game in registry.GAMES])
+    groups["Menu"] = assets.MENU
+
+    print("memory: assets held after importing every game%s" %
+          (games.LOW_MEMORY and " (low-memory mode)" or ""))
+    sys.stdout.write(games.memory_report(groups))
+
+
+def bench_rotation(steps=(1, 5, 15), turns=5):
+    """
+    Cost of turning a sprite by one degree, with the rotation cache (for
+    a few angle steps) and without it (rotating the image every time).
+    """
+    image = _falling_images()[0]
+    sprite = games.Sprite(image)
+    cache = games.rotation_cache
+    saved = (cache.step, cache.budget)
+
+    def turn():
+        sprite.angle += 1
+
+    def turn_uncached():
+        sprite._angle = (sprite._angle + 1) % 360
+        sprite._replace(pygame.transform.rotate(image, -sprite._angle))
+
+    print("rotation: %d turns of a %dx%d image" % ((turns,) + image.get_size()))
+    print("%10s %12s %12s %10s" % ("step", "turn (us)", "cached (KB)", "hit rate"))
+    print("%10s %12.2f %12s %10s" % ("uncached", _timeit(turn_uncached, turns * 360), "-", "-"))
+    for step in steps:
+        cache.clear()
+        cache.hits = cache.misses = 0
+        cache.step = step
+        cache.budget = 64 * 1024 * 1024
+        cost = _timeit(turn, turns * 360)
+        print("%10d %12.2f %12d %9.0f%%" % (step, cost, cache.size // 1024,
+                                           100.0 * cache.hits / (cache.hits + cache.misses)))
+    cache.clear()
+    cache.step, cache.budget = saved
+    sprite.destroy()
+
+
+def bench_spawn(spawns=5000):
+    """
+    Cost of putting a short-lived sprite in play and destroying it,
+    constructed every time or taken from its SpritePool.
+    """
+    images = _falling_images()
+    messages = games.get_pool(games.Message)
+    animations = games.get_pool(games.Animation)
+    frames = games.load_frames(games.load_atlas("graphics/phone/explosion.png"), 4)
+
+    def sprite(make):
+        def spawn():
+            sprite = make()
+            games.screen.add(sprite)
+            sprite.destroy()
+        return spawn
+
+    cases = (("Sprite",
+              sprite(lambda: games.Sprite(random.choice(images), x=100, y=70, dy=1)),
+              sprite(lambda: games.get_pool(games.Sprite).acquire(random.choice(images),
+                                                                  x=100, y=70, dy=1))),
+             ("Message",
+              sprite(lambda: games.Message("Game Over", 30, (255, 255, 255), lifetime=50)),
+              sprite(lambda: messages.acquire("Game Over", 30, (255, 255, 255), lifetime=50))),
+             ("Animation",
+              sprite(lambda: games.Animation(frames, n_repeats=1)),
+              sprite(lambda: animations.acquire(frames, n_repeats=1))))
+
+    print("spawn: %d sprites put in play and destroyed" % spawns)
+    print("%10s %12s %12s %10s" % ("class", "new (us)", "pooled (us)", "misses"))
+    for (name, new, pooled) in cases:
+        print("%10s %12.2f %12.2f %10d" % (name, _timeit(new, spawns), _timeit(pooled, spawns),
+                                          games.get_pool(getattr(games, name)).misses))
+    games.screen.clear()
+
+
+BENCHMARKS = {"blit_formats": bench_blit_formats,
+              "memory": bench_memory,
+              "overlap": bench_overlap,
+              "phone_frame": bench_phone_frame,
+              "redraw": bench_redraw,
+              "rotation": bench_rotation,
+              "spawn": bench_spawn,
+              "startup": bench_startup}
+
+
+def main(names):
+    """Run the named benchmarks (all of them if none are given)."""
+    games.init(screen_width = 640, screen_height = 480, fps = 50)
+
+    for name in names or sorted(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print("Unknown benchmark '%s'. Choose from: %s" %
+                  (name, ", ".join(sorted(BENCHMARKS))))
+            sys.exit(1)
+        BENCHMARKS[name]()
+        print()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,34 @@
+#/usr/bin/env python
+#
+# Build Assets
+#
+# Packs every image, sound and text file under graphics/ and sound/ into
+# assets.pak, which the arcade memory-maps at startup instead of loading
+# hundreds of loose files. Runs headless, but must be run on the machine
+# (or one with the same display and audio setup) the arcade runs on: the
+# images and sounds are stored already converted to its formats.
+#
+# Usage: python build_assets.py [archive]
+
+"""Packs the arcade's assets into a single archive."""
+
+import os
+
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from utility import games
+
+ASSET_DIRECTORIES = ("graphics", "sound")
+
+
+def main(args):
+    path = args and args[0] or "assets.pak"
+    games.init(screen_width = 640, screen_height = 480, fps = 50)
+    count = games.AssetArchive.build(path, ASSET_DIRECTORIES)
+    print("Packed %d assets into %s (%d bytes)" % (count, path, os.path.getsize(path)))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
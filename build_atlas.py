@@ -0,0 +1,58 @@
+#/usr/bin/env python
+#
+# Build Atlas
+#
+# Packs groups of images into sprite sheets (see games.Atlas): one .png
+# holding every frame plus a .txt table saying where each one is. The
+# games load the sheets with games.load_atlas(); the loose images are
+# kept as the source the sheets are built from.
+#
+# Usage: python build_atlas.py                      (rebuild every atlas below)
+#        python build_atlas.py sheet.png image ...  (build one atlas)
+
+"""Builds the sprite sheets used by PyArcade's games."""
+
+import os
+
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from utility import games
+
+ATLASES = {
+    "graphics/phone/explosion.png":
+        ["graphics/phone/explosion%d.bmp" % n for n in range(1, 10)],
+    "graphics/phone/falling_objects.png":
+        "graphics/phone/objects.txt",
+    # The Simon buttons come in two shapes; packed together they would
+    # leave a tenth of the sheet empty, so each shape gets its own.
+    "graphics/simon/wide_buttons.png":
+        ["graphics/simon/%s_bttn%s.png" % (color, state)
+         for state in ("", "_pressed")
+         for color in ("yellow", "blue")],
+    "graphics/simon/tall_buttons.png":
+        ["graphics/simon/%s_bttn%s.png" % (color, state)
+         for state in ("", "_pressed")
+         for color in ("red", "green")],
+}
+
+
+def build(path, filenames):
+    # A single name is a manifest listing the images.
+    if type(filenames) is type(""):
+        filenames = games.load_manifest(filenames)
+    count = games.Atlas.build(path, filenames)
+    print("Packed %d frames into %s" % (count, path))
+
+
+def main(args):
+    games.init(screen_width = 640, screen_height = 480, fps = 50)
+    if args:
+        build(args[0], args[1:])
+    else:
+        for path in sorted(ATLASES):
+            build(path, ATLASES[path])
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
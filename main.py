@@ -23,7 +23,14 @@
 
 """Runs and manages PyArcade 1.0"""
 
-name = input("PyArcade 1.0 -- Enter a player name (5 characters or less): ")
+import os
+
+from utility import startup
+
+# [Note: A cabinet can set PYARCADE_PLAYER to skip the prompt.]
+with startup.Span("player name", waiting=True):
+    name = (os.environ.get("PYARCADE_PLAYER") or
+            input("PyArcade 1.0 -- Enter a player name (5 characters or less): "))
 
 NAME = name[:5]
 
@@ -31,24 +38,19 @@ import sys
 
 import pygame
 
-from menu import Menu
-
-import score
-
-from utility import games, constants
+with startup.Span("pygame init"):
+    from utility import games
 
-# Games
-# ------------------
-from pong import Pong
+with startup.Span("import menu"):
+    from menu import Menu
 
-from simon import Simon
+with startup.Span("import score"):
+    import score
 
-from phone import Game
-# ------------------
+from utility import constants, registry
 
-SCORE_FILES = {constants.PONG: "utility/pong_score.txt",
-               constants.SIMON: "utility/simon_score.txt",
-               constants.PHONE: "utility/phone_score.txt"}
+# [Note: The games themselves are only imported when first
+#        launched (see utility/registry.py).]
 
 def handle_input(menu):
     """
@@ -75,12 +77,7 @@ def handle_input(menu):
         score.ScoreMenu().start()
         return
 
-    if menu.option == constants.PONG:
-        Pong().start()
-    elif menu.option == constants.SIMON:
-        Simon().start()
-    else:
-        Game().start() # [Note: Game() refers to the game "Save the Phone"]
+    registry.get(menu.option).launch()
 
     handle_score(menu.option)
         
@@ -102,14 +99,15 @@ def handle_score(option):
     # score doesn't make it to the current high score table.
     score.add_score(name=NAME,
                     value=int(current_score.read()),
-                    txt_file_path = SCORE_FILES[option])
+                    txt_file_path = registry.get(option).score_file)
 
     current_score.close()
                    
 
 def main():
     """Kickstart PyArcade."""
-    menu = Menu()
+    with startup.Span("menu setup"):
+        menu = Menu()
     
     while True:
         # Start the menu. Here, the player sets values
@@ -12,7 +12,7 @@ import sys
 
 import pygame
 
-from utility import games, color, constants
+from utility import games, color, constants, assets, registry, startup
 
 if __name__ == '__main__':
     print("-menu.py-\n")
@@ -21,16 +21,38 @@ if __name__ == '__main__':
     sys.exit(1)
 
 # Initialize screen
-games.init(screen_width = 640, screen_height = 480, fps = 50)
+with startup.Span("display init"):
+    games.init(screen_width = 640, screen_height = 480, fps = 50)
+
+# Find out which image formats blit fastest on this display, before
+# any image is loaded.
+with startup.Span("blit calibration"):
+    games.calibrate_formats()
+
+# Read assets from the packed archive, if one has been built
+# (see build_assets.py).
+with startup.Span("open asset archive"):
+    games.use_archive("assets.pak")
 
 games.window.title = "PyArcade"
 
 # [Note: Always manage games.window after the graphics screen
 #        is initialized (not before).]
 
+# Decode the menu's own assets now. Each game's are loaded when it is
+# first launched, or prefetched while the cursor rests on it.
+with startup.Span("menu assets"):
+    games.preload_assets(assets.MENU)
+
+# Loads the assets of the game under the cursor.
+prefetcher = games.Prefetcher()
+
 class Cursor(games.Sprite):
     """The cursor for the menu."""
     image = games.load_image("graphics/menu/cursor.png")
+
+    # Frames the cursor must rest on a game before it is prefetched.
+    prefetch_delay = 10
     
     def __init__(self, menu):
         """Initialize the cursor."""
@@ -48,7 +70,17 @@ class Cursor(games.Sprite):
 
     def update(self):
         """Called at every frame."""
+        startup.interactive()
         self.check_input()
+        self.prefetch()
+
+    def prefetch(self):
+        """Prefetch the highlighted game once the cursor rests on it."""
+        self.resting += 1
+        game = registry.get(self.current_option)
+        if self.resting == Cursor.prefetch_delay and game:
+            prefetcher.prefetch(game.manifest)
+        prefetcher.poll()
     
     def check_input(self):
         """Check for any player input while on the menu."""
@@ -98,16 +130,24 @@ class Cursor(games.Sprite):
             # accuracy (at the cost of consuming more
             # processor time).
             pygame.time.wait(1000)
+
+            # Keep whatever was prefetched in the meantime.
+            prefetcher.poll()
             
             games.screen.quit() # main.py takes control
 
     def draw(self):
         """Draw the cursor at a new position."""
+        # The cursor moved: whatever was being prefetched is not wanted.
+        self.resting = 0
+        prefetcher.cancel()
+
         screen = games.screen.display
 
         menu = self.menu.menu_options
 
-        background = pygame.image.load("graphics/menu/background.png").convert()
+        background = games.load_image("graphics/menu/background.png",
+                                      transparent=False)
 
         # Blit screen with background to erase previous drawing.
         screen.blit(background, (0,0))
@@ -128,6 +168,9 @@ class Cursor(games.Sprite):
 
         pygame.display.update()
 
+        # The background was blitted over every sprite: draw them again.
+        games.screen.invalidate()
+
     
 class Menu(object):
     """PyArcade's main interface."""
@@ -142,8 +185,8 @@ class Menu(object):
         # Set text for the available games.
         i = 0
         self.games = []
-        for game in ("Pong", "Simon Says", "Save the Phone"):
-            self.games.append(games.Text(value=game,
+        for game in registry.GAMES:
+            self.games.append(games.Text(value=game.title,
                                          size=40,
                                          color=color.white,
                                          x=games.screen.width/2,
@@ -172,7 +215,8 @@ class Menu(object):
 
         # Show transitions
         if not self.game_started:
-            self.transition()
+            with startup.Span("splash screens"):
+                self.transition()
             self.game_started = True
 
         games.screen.background = games.load_image("graphics/menu/background.png",
@@ -189,7 +233,8 @@ class Menu(object):
 
         games.screen.add(Cursor(self))
 
-        games.music.load("sound/menu/theme.wav")
+        with startup.Span("menu music"):
+            games.music.load("sound/menu/theme.wav")
         
         games.music.play(-1)
         
@@ -200,6 +245,12 @@ class Menu(object):
         """Show game's preliminary images."""
         image_paths = ("graphics/menu/transition1.png",
                        "graphics/menu/transition2.png")
+
+        if startup.FAST_BOOT:
+            # Get the first game under the cursor ready while the
+            # splash screens are up (see _blit).
+            prefetcher.prefetch(registry.get(constants.PONG).manifest)
+
         for path in image_paths:
             self._blit(path)
 
@@ -217,7 +268,18 @@ class Menu(object):
         
         screen.blit(image, (0,0))
         pygame.display.update()
-        pygame.time.wait(waiting_time)
+
+        with startup.Span("show " + image_path, waiting=True):
+            if not startup.FAST_BOOT:
+                pygame.time.wait(waiting_time)
+                return
+            
+            # Fast boot: only keep the image up while assets are loading.
+            deadline = pygame.time.get_ticks() + waiting_time
+            while prefetcher.busy and pygame.time.get_ticks() < deadline:
+                prefetcher.poll()
+                pygame.event.pump()
+                pygame.time.wait(10)
 
     def get_option(self):
         """Return the menu option chosen by the player."""
@@ -14,7 +14,7 @@ import random
 
 import pygame
 
-from utility import games, color
+from utility import games, color, assets, constants, registry
 
 from score import check_score
 
@@ -28,6 +28,15 @@ L_BOUNDARY = 17
     
 R_BOUNDARY = 12 
 
+# Images and sounds used during a game, decoded up front.
+games.preload_assets(assets.PHONE)
+
+# Collision categories. The phone only needs to be tested against
+# falling objects (not messages or explosions).
+PHONE = 2
+
+FALLING = 4
+
 class Phone(games.Sprite):
     """Phone sprite that the player controls. Only moves horizontally."""
     images = { "happy" : games.load_image("graphics/phone/phone_happy.png"),
@@ -37,7 +46,10 @@ class Phone(games.Sprite):
         """Initialize Phone sprite object."""
         super(Phone, self).__init__(image=Phone.images["happy"],
                                     x=games.mouse.x,
-                                    bottom=games.screen.height - 35)
+                                    bottom=games.screen.height - 35,
+                                    category=PHONE,
+                                    collides_with=FALLING,
+                                    is_precise=True) # ignore transparent corners
         
         self.game = game
 
@@ -54,7 +66,7 @@ class Phone(games.Sprite):
 
         # End game if any object has collided with phone.
         if self.overlapping_sprites:
-            phone_explosion = Explosion(x=self.x, y=self.y)
+            phone_explosion = games.get_pool(Explosion).acquire(x=self.x, y=self.y)
             games.screen.add(phone_explosion)
             self.destroy()
             self.game.end()
@@ -100,23 +112,23 @@ class FallingObject(games.Sprite):
     """A random object that falls from the sky."""
     # ----------------------
     # Load sprite images
-    objects = open("graphics/phone/objects.txt", "r")
-
-    images = []
-    for image_path in objects:
-        images.append(games.load_image(image_path.replace("\n", "")))
-        
-    objects.close()
+    images = games.load_atlas("graphics/phone/falling_objects.png").images()
     # ----------------------
 
     speed = 1 
     
     def __init__(self, game):
         """Initialize Falling object."""
-        super(FallingObject, self).__init__(image=random.choice(FallingObject.images),
-                                             x=random.randrange(580),
-                                             y=70,
-                                             dy=FallingObject.speed)
+        self.reset(game)
+
+    def reset(self, game):
+        """Set up a new (or reused) falling object. See games.SpritePool."""
+        super(FallingObject, self).reset(image=random.choice(FallingObject.images),
+                                         x=random.randrange(580),
+                                         y=70,
+                                         dy=FallingObject.speed,
+                                         category=FALLING,
+                                         collides_with=PHONE)
         games.load_sound("sound/phone/new_object.wav").play()
         
         self.game = game
@@ -136,6 +148,9 @@ class FallingObject(games.Sprite):
         
         # Destroy object and update score when it reaches the bottom.
         if self.bottom > games.screen.height - 35:
+            # Once destroyed, this object may be reused for a new one.
+            if self.game.object_above_phone is self:
+                self.game.no_danger()
             self.destroy()
             self.game.update_score()
             return
@@ -150,24 +165,21 @@ class FallingObject(games.Sprite):
 class Explosion(games.Animation):
     """An animated explosion."""
     
-    frames = ("graphics/phone/explosion1.bmp",
-              "graphics/phone/explosion2.bmp",
-              "graphics/phone/explosion3.bmp",
-              "graphics/phone/explosion4.bmp",
-              "graphics/phone/explosion5.bmp",
-              "graphics/phone/explosion6.bmp",
-              "graphics/phone/explosion7.bmp",
-              "graphics/phone/explosion8.bmp",
-              "graphics/phone/explosion9.bmp")
+    # Shared by every explosion: each frame is shown for 4 ticks.
+    frames = games.load_frames(games.load_atlas("graphics/phone/explosion.png"),
+                               durations=4)
 
     def __init__(self, x, y):
         """Initialize explosion."""
-        super(Explosion, self).__init__(images=Explosion.frames,
-                                        x=x,
-                                        y=y,
-                                        repeat_interval=4,
-                                        n_repeats=1,
-                                        is_collideable=False)
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        """Set up a new (or reused) explosion. See games.SpritePool."""
+        super(Explosion, self).reset(images=Explosion.frames,
+                                     x=x,
+                                     y=y,
+                                     n_repeats=1,
+                                     is_collideable=False)
         games.load_sound("sound/phone/explosion.wav").play()
 
 
@@ -184,7 +196,8 @@ class Game(object):
         
         self.mobile = Phone(self)
         
-        self.initial_msg = games.Message(value="Random objects are falling!",
+        self.initial_msg = games.get_pool(games.Message).acquire(
+                                         value="Random objects are falling!",
                                          size=30,
                                          color=color.white,
                                          right=games.screen.width - 10,
@@ -234,17 +247,17 @@ class Game(object):
         self.mobile.alert(self.object_above_phone)
 
         # Check if a falling object is above the phone.
-        for sprite in games.screen.all_objects:
-            if sprite not in (self.mobile, self.initial_msg):
-                if sprite.right >= self.mobile.left and sprite.right <= self.mobile.right:
-                    if self.object_above_phone == None:
-                        self.object_above_phone = sprite
+        for sprite in games.screen.instances_of(FallingObject):
+            if sprite.right >= self.mobile.left and sprite.right <= self.mobile.right:
+                if self.object_above_phone == None:
+                    self.object_above_phone = sprite
 
         # See if it's time to add a new random object.
         if self._count > 0:
             self._count -= 1
             return
-        falling_object = FallingObject(self)
+        # Objects that reached the bottom are reused (see games.SpritePool).
+        falling_object = games.get_pool(FallingObject).acquire(self)
         games.screen.add(falling_object) # add object
         
         # Set so buffer will be about 30% of falling_object's height (Formula by Michael Dawson).
@@ -263,6 +276,10 @@ class Game(object):
     def no_danger(self, no_danger = True):
         if no_danger:
             self.object_above_phone = None
+            # The phone is happy again, and ready to be scared by the next
+            # object (even if this one is reused before the phone moves).
+            self.mobile.image = Phone.images["happy"]
+            self.mobile.can_play_sound = True
     
     def end(self):
         """End the game."""
@@ -277,9 +294,8 @@ class Game(object):
         FallingObject.speed = 1
         
         # Remove falling objects
-        for sprite in games.screen.all_objects:
-            if str(sprite) == "Falling object":
-                sprite.destroy()
+        for sprite in games.screen.instances_of(FallingObject):
+            sprite.destroy()
 
         games.music.stop()
         
@@ -288,26 +304,29 @@ class Game(object):
 
         # Set the Game Over message. Note that self.check_if_high_score()
         # will be called after the message dissappears.
-        message = games.Message(value="Game Over",
-                                size=30,
-                                color=color.white,
-                                right=games.screen.width - 10,
-                                bottom=games.screen.height - 10,
-                                lifetime=6.5 * games.screen.fps,
-                                after_death=self.check_if_high_score)
+        messages = games.get_pool(games.Message)
+        message = messages.acquire(value="Game Over",
+                                   size=30,
+                                   color=color.white,
+                                   right=games.screen.width - 10,
+                                   bottom=games.screen.height - 10,
+                                   lifetime=6.5 * games.screen.fps,
+                                   after_death=self.check_if_high_score)
         # Game Over
         games.screen.add(message)
 
     def check_if_high_score(self):
         """Check if player made it to the high scores."""
-        if check_score(value=self.score, txt_file_path="utility/phone_score.txt"):
+        if check_score(value=self.score,
+                       txt_file_path=registry.get(constants.PHONE).score_file):
             games.load_sound("sound/menu/high_score.wav").play()
-            games.screen.add(games.Message(value="High Score",
-                                size=30,
-                                color=color.white,
-                                x=games.screen.width - 60,
-                                y=games.screen.height - 20,
-                                lifetime=5.5 * games.screen.fps,
-                                after_death = games.screen.quit))
+            messages = games.get_pool(games.Message)
+            games.screen.add(messages.acquire(value="High Score",
+                                              size=30,
+                                              color=color.white,
+                                              x=games.screen.width - 60,
+                                              y=games.screen.height - 20,
+                                              lifetime=5.5 * games.screen.fps,
+                                              after_death = games.screen.quit))
             return
         games.screen.quit()
@@ -17,7 +17,7 @@ import random
 
 from pygame import time
 
-from utility import games, color
+from utility import games, color, assets, constants, registry
 
 from score import check_score
 
@@ -27,6 +27,15 @@ if __name__ == '__main__':
     input("* Press the enter key to exit.")
     sys.exit(1)
 
+# Images and sounds used during a game, decoded up front.
+games.preload_assets(assets.PONG)
+
+# Collision categories. The ball only needs to be tested against the
+# paddles, never the net, walls, logo or score.
+PADDLE = 2
+
+BALL = 4
+
 class Paddle(games.Sprite):
     """Player's paddle that moves up and down with the mouse."""
     image = games.load_image("graphics/pong/paddle.png")
@@ -36,7 +45,9 @@ class Paddle(games.Sprite):
     def __init__(self):
         super(Paddle, self).__init__(image=Paddle.image,
                                      x=Paddle.x_coord, # fixed x
-                                     y=games.mouse.y)
+                                     y=games.mouse.y,
+                                     category=PADDLE,
+                                     collides_with=BALL)
 
     def __str__(self):
         return "Paddle"
@@ -64,7 +75,9 @@ class CPUPaddle(games.Sprite):
                                            x=CPUPaddle.x_coord, # fixed x
                                            y=games.screen.height/2,
                                            dx=0,
-                                           dy=0)
+                                           dy=0,
+                                           category=PADDLE,
+                                           collides_with=BALL)
     
     def __str__(self):
         return "CPU paddle"
@@ -117,7 +130,9 @@ class Ball(games.Sprite):
                                    x=games.screen.width/2,
                                    y=games.screen.height/2,
                                    dx=random.choice((1.5, -1.5)),
-                                   dy=random.choice((1.5, -1.5)))
+                                   dy=random.choice((1.5, -1.5)),
+                                   category=BALL,
+                                   collides_with=PADDLE)
         self.game = game # Maintain contact with the game object itself (e.g. useful
                          # when notifying the game that the score should be updated
                          # or that the game must end).
@@ -256,11 +271,12 @@ class Pong(object):
         games.screen.background = games.load_image("graphics/pong/background.png",
                                                    transparent = False)
         
-        self.score = games.Text(value=0,
-                                size=35,
-                                color=color.white,
-                                top=5,
-                                right=games.screen.width - 10)
+        self.score = games.Counter(value=0,
+                                   size=35,
+                                   color=color.white,
+                                   top=5,
+                                   right=games.screen.width - 10,
+                                   digits=5)
         
         self.bottom_wall = games.Sprite(image=games.load_image("graphics/pong/wall.png"),
                                         x=games.screen.width/2,
@@ -293,7 +309,6 @@ class Pong(object):
                                          lifetime=5 * games.screen.fps)
         
         self.game_objects = (Paddle(), CPUPaddle(), Ball(self),
-                             self.top_wall, self.bottom_wall,
                              self.score)
         
         # game-screen settings
@@ -312,10 +327,16 @@ class Pong(object):
         """Start the game."""
         games.screen.clear()
         
+        # The net, walls and logo never move, so they are baked into
+        # the background once instead of being redrawn every frame.
         for square in self.net:
-            games.screen.add(square)
+            games.screen.add(square, static=True)
    
-        games.screen.add(self.logo)
+        games.screen.add(self.logo, static=True)
+
+        games.screen.add(self.top_wall, static=True)
+
+        games.screen.add(self.bottom_wall, static=True)
 
         games.screen.add(self.initial_msg)
         
@@ -383,7 +404,8 @@ class Pong(object):
 
     def check_if_high_score(self):
         """Check if player made it to the high scores."""
-        if check_score(value=self.score.value, txt_file_path="utility/pong_score.txt"):
+        if check_score(value=self.score.value,
+                       txt_file_path=registry.get(constants.PONG).score_file):
             games.load_sound("sound/menu/high_score.wav").play()
             games.screen.add(games.Message(value="High Score",
                                            size=40,
@@ -12,7 +12,7 @@ import sys
 
 import pygame
 
-from utility import games, color
+from utility import games, color, registry
 
 if __name__ == '__main__':
     print("-score.py-\n")
@@ -253,7 +253,8 @@ class Cursor(games.Sprite):
 
         menu = self.menu.menu_options
 
-        background = pygame.image.load("graphics/menu/background.png").convert()
+        background = games.load_image("graphics/menu/background.png",
+                                      transparent=False)
 
         # Blit screen with background to erase previous drawing.
         screen.blit(background, (0,0))
@@ -273,15 +274,16 @@ class Cursor(games.Sprite):
 
         pygame.display.update()
 
+        # The background was blitted over every sprite: draw them again.
+        games.screen.invalidate()
+
 
 class ScoreMenu(object):
     """PyArcade's score interface."""
 
     all_options = None
 
-    high_scores = (("Pong", "utility/pong_score.txt"),
-                   ("Simon Says", "utility/simon_score.txt"),
-                   ("Save The Phone", "utility/phone_score.txt"))
+    high_scores = tuple([(game.title, game.score_file) for game in registry.GAMES])
 
     current_game = high_scores[0]
 
@@ -322,7 +324,7 @@ class ScoreMenu(object):
 
         games.music.play(-1)
 
-        show_scores("Pong", "utility/pong_score.txt")
+        show_scores(*ScoreMenu.current_game)
 
         # Start Score Menu
         games.screen.mainloop()
@@ -335,15 +337,9 @@ class ScoreMenu(object):
 
     def get_next():
         """Return the next game being shown when 'Next' is pressed."""
-        if ScoreMenu.current_game == ScoreMenu.high_scores[0]:
-            ScoreMenu.current_game = ScoreMenu.high_scores[1]
-            return ScoreMenu.current_game
-        
-        if ScoreMenu.current_game == ScoreMenu.high_scores[1]:
-            ScoreMenu.current_game = ScoreMenu.high_scores[2]
-            return ScoreMenu.current_game
-        
-        ScoreMenu.current_game = ScoreMenu.high_scores[0]
+        index = ScoreMenu.high_scores.index(ScoreMenu.current_game)
+        index = (index + 1) % len(ScoreMenu.high_scores)
+        ScoreMenu.current_game = ScoreMenu.high_scores[index]
         return ScoreMenu.current_game
     
     get_next = staticmethod(get_next)
@@ -15,7 +15,7 @@ import random
 
 from pygame import time
 
-from utility import games, color
+from utility import games, color, assets, constants, registry
 
 from score import check_score
 
@@ -27,6 +27,9 @@ if __name__ == '__main__':
 
 score = None
 
+# Images and sounds used during a game, decoded up front.
+games.preload_assets(assets.SIMON)
+
 class Button(games.Sprite):
     """A Simon Says button."""
     label = ("yellow", "red", "blue", "green")
@@ -37,17 +40,22 @@ class Button(games.Sprite):
                 label[2]: games.K_DOWN,
                 label[3]: games.K_RIGHT}
     
+    # Button images, pressed or not, live in two sprite sheets: one for
+    # the wide buttons (top and bottom), one for the tall ones (sides).
+    wide = games.load_atlas("graphics/simon/wide_buttons.png")
+    tall = games.load_atlas("graphics/simon/tall_buttons.png")
+
     # Button images (to be accessed by the Simon() class).
-    bttn_img = (games.load_image("graphics/simon/yellow_bttn.png"),
-                games.load_image("graphics/simon/red_bttn.png"),
-                games.load_image("graphics/simon/blue_bttn.png"),
-                games.load_image("graphics/simon/green_bttn.png"))
+    bttn_img = (wide["yellow_bttn"],
+                tall["red_bttn"],
+                wide["blue_bttn"],
+                tall["green_bttn"])
 
     # Pressed button images (to be accessed by the Simon() class).
-    bttn_pressed_img = (games.load_image("graphics/simon/yellow_bttn_pressed.png"),
-                        games.load_image("graphics/simon/red_bttn_pressed.png"),
-                        games.load_image("graphics/simon/blue_bttn_pressed.png"),
-                        games.load_image("graphics/simon/green_bttn_pressed.png"))
+    bttn_pressed_img = (wide["yellow_bttn_pressed"],
+                        tall["red_bttn_pressed"],
+                        wide["blue_bttn_pressed"],
+                        tall["green_bttn_pressed"])
 
     # Each button's unique sound (to be accessed by the Simon() class and
     # every Button instance).
@@ -295,7 +303,8 @@ class Simon(object):
 
         time.wait(2000)
 
-        if check_score(value=Simon.score, txt_file_path="utility/simon_score.txt"):
+        if check_score(value=Simon.score,
+                       txt_file_path=registry.get(constants.SIMON).score_file):
             games.load_sound("sound/menu/high_score.wav").play()
             time.wait(1500)
         
@@ -0,0 +1,77 @@
+#/usr/bin/env python
+#
+# Asset Manifests
+#
+# Every image, sprite sheet and sound each part of PyArcade loads,
+# so they can all be decoded ahead of time (and in parallel) with
+# games.preload_assets() instead of one by one as each module is
+# imported.
+#
+# E.g. menu.py preloads MENU at startup, and each game preloads its
+# own manifest when its module is first imported (see registry.py),
+# which costs nothing if the menu already prefetched it while the
+# cursor rested on the game. Music isn't preloaded (it is streamed
+# as it plays), only prefetched.
+#
+# Keep these in step with the load_image(), load_atlas() and
+# load_sound() calls in the games: anything missing here still
+# loads, just not ahead of time.
+
+"""Asset manifests used by games.preload_assets()"""
+
+MENU = {"images": ("graphics/menu/cursor.png",),
+        "backgrounds": ("graphics/menu/background.png",),
+        "sounds": ("sound/menu/cursor.wav",
+                   "sound/menu/cursor_up.wav",
+                   "sound/menu/enter.wav",
+                   "sound/menu/enter2.wav",
+                   "sound/menu/exit.wav",
+                   "sound/menu/high_score.wav"),
+        "music": ("sound/menu/theme.wav",
+                  "sound/menu/high_score_theme.wav")}
+
+PONG = {"images": ("graphics/pong/paddle.png",
+                   "graphics/pong/ball.png",
+                   "graphics/pong/wall.png",
+                   "graphics/pong/net.png",
+                   "graphics/pong/logo.png"),
+        "backgrounds": ("graphics/pong/background.png",),
+        "sounds": ("sound/pong/bounce.wav",
+                   "sound/pong/advance.wav",
+                   "sound/pong/game_over.wav"),
+        "music": ("sound/pong/theme.wav",)}
+
+SIMON = {"images": ("graphics/simon/computer.png",),
+         "backgrounds": ("graphics/simon/background.png",),
+         "atlases": ("graphics/simon/wide_buttons.png",
+                     "graphics/simon/tall_buttons.png"),
+         "sounds": ("sound/simon/tone1.wav",
+                    "sound/simon/tone2.wav",
+                    "sound/simon/tone3.wav",
+                    "sound/simon/tone4.wav",
+                    "sound/simon/round_end.wav",
+                    "sound/simon/game_over.wav")}
+
+PHONE = {"images": ("graphics/phone/phone_happy.png",
+                    "graphics/phone/phone_scared.png"),
+         "backgrounds": ("graphics/phone/background.png",),
+         "atlases": ("graphics/phone/falling_objects.png",
+                     "graphics/phone/explosion.png"),
+         "sounds": ("sound/phone/scared.wav",
+                    "sound/phone/new_object.wav",
+                    "sound/phone/explosion.wav",
+                    "sound/phone/game_over.wav"),
+         "music": ("sound/phone/theme.wav",)}
+
+
+def combine(*manifests):
+    """Return one manifest listing everything in the given ones."""
+    combined = {}
+    for manifest in manifests:
+        for kind, filenames in manifest.items():
+            combined[kind] = combined.get(kind, ()) + tuple(filenames)
+    return combined
+
+
+# Everything the arcade loads (e.g. for benchmark.py).
+ARCADE = combine(MENU, PONG, SIMON, PHONE)
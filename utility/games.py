@@ -81,8 +81,19 @@
 ################################################################################
 
 import pygame, pygame.image, pygame.mixer, pygame.font, pygame.transform 
-import pygame.draw 
+import pygame.draw, pygame.mask 
 from pygame.locals import * 
+import weakref, collections, time, io
+import os, mmap, json, struct
+import concurrent.futures
+
+# Low-memory mode, for small cabinet boards: set PYARCADE_LOW_MEMORY=1.
+# Images are stored in 8 or 16 bits per pixel instead of the display's
+# depth (see _reduce_depth) and sounds at half the usual sample rate.
+LOW_MEMORY = os.environ.get("PYARCADE_LOW_MEMORY", "") not in ("", "0")
+
+if LOW_MEMORY:
+    pygame.mixer.pre_init(22050)
 
 pygame.init() 
  
@@ -94,6 +105,21 @@ pygame.init()
 class GamesError(Exception): pass
 
 
+############################################################################### 
+## Collision categories ####################################################### 
+############################################################################### 
+##
+## Every sprite belongs to a category (a bit flag) and carries a mask of
+## the categories it can collide with. Two sprites are only tested
+## against each other when each one's mask includes the other's category.
+##
+###############################################################################
+
+DEFAULT_CATEGORY = 1
+
+ALL_CATEGORIES = ~0
+
+
 ############################################################################### 
 ## Mouse class ################################################################ 
 ###############################################################################
@@ -154,7 +180,13 @@ class Keyboard(object):
 
 class Music(object):
     def load(self, filename):
-        pygame.mixer.music.load(filename)
+        data = music_cache.get(filename)
+        if data is None:
+            pygame.mixer.music.load(filename)
+        else:
+            # Prefetched (see Prefetcher): stream it from memory instead.
+            self._stream = io.BytesIO(data)
+            pygame.mixer.music.load(self._stream)
 
     def play(self, loop=0):
         pygame.mixer.music.play(loop)
@@ -166,6 +198,324 @@ class Music(object):
         pygame.mixer.music.stop()
 
 
+###############################################################################
+## SpatialHash class ##########################################################
+###############################################################################
+##
+## A uniform grid of square cells. The Screen files every sprite in play
+## under the cells its rectangle covers, so an overlap query only has to
+## look at the sprites sharing a cell with the query rectangle.
+##
+###############################################################################
+
+class SpatialHash(object):
+    def __init__(self, cell_size=64):
+        self._cell_size = cell_size
+        # (column, row) -> OrderedDict {sprite: None}, in insertion order
+        self._cells = {}
+        # sprite -> (left, top, right, bottom) cell span it is filed under
+        self._spans = {}
+
+    def _span(self, rect):
+        size = self._cell_size
+        return (rect.left // size,
+                rect.top // size,
+                max(rect.right - 1, rect.left) // size,
+                max(rect.bottom - 1, rect.top) // size)
+
+    def _file(self, sprite, span):
+        cells = self._cells
+        left, top, right, bottom = span
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                cell = cells.get((column, row))
+                if cell is None:
+                    cell = cells[(column, row)] = collections.OrderedDict()
+                cell[sprite] = None
+
+    def _unfile(self, sprite, span):
+        cells = self._cells
+        left, top, right, bottom = span
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                cell = cells[(column, row)]
+                del cell[sprite]
+                if not cell:
+                    del cells[(column, row)]
+
+    def insert(self, sprite):
+        if sprite in self._spans:
+            self.move(sprite)
+            return
+        span = self._span(sprite._rect)
+        self._spans[sprite] = span
+        self._file(sprite, span)
+
+    def remove(self, sprite):
+        span = self._spans.pop(sprite, None)
+        if span is not None:
+            self._unfile(sprite, span)
+
+    def move(self, sprite):
+        """
+        Refile a sprite after its rectangle changed. Sprites that are not
+        in the grid are ignored, and nothing is done unless the sprite
+        crossed into a different set of cells.
+        """
+        old_span = self._spans.get(sprite)
+        if old_span is None:
+            return
+        new_span = self._span(sprite._rect)
+        if new_span != old_span:
+            self._unfile(sprite, old_span)
+            self._spans[sprite] = new_span
+            self._file(sprite, new_span)
+
+    def query(self, rect):
+        """
+        Return the sprites filed under any cell the rectangle covers,
+        without duplicates. They still need an exact rectangle test.
+        """
+        cells = self._cells
+        left, top, right, bottom = self._span(rect)
+        found = collections.OrderedDict()
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                cell = cells.get((column, row))
+                if cell:
+                    found.update(cell)
+        return found
+
+    def clear(self):
+        self._cells = {}
+        self._spans = {}
+
+
+###############################################################################
+## SpriteRegistry class #######################################################
+###############################################################################
+##
+## The sprites in play, kept in numbered layers. Higher layers are drawn
+## over lower ones; within a layer, sprites are drawn in the order they
+## were added (the last one on top). Adding and removing a sprite are
+## constant time, and the drawing order is only rebuilt after it changes.
+##
+## Sprites are also indexed by class (and every base class) and by their
+## tags, so finding e.g. all the falling objects costs time proportional
+## to how many there are, not to how many sprites are in play.
+##
+###############################################################################
+
+class SpriteRegistry(object):
+    def __init__(self):
+        # layer number -> OrderedDict {sprite: None}, bottom to top
+        self._layers = {}
+        # sprite -> layer number
+        self._layer_of = {}
+        # Cached drawing orders (tuples), or None when they must be rebuilt.
+        self._order = ()
+        self._active = ()
+        # Sprites baked into the Screen's static layer: {sprite: None}
+        self._static = {}
+        # class or tag -> OrderedDict {sprite: None}, in insertion order
+        self._index = {}
+        # sprite -> the classes and tags it was indexed under
+        self._keys_of = {}
+
+    def __len__(self):
+        return len(self._layer_of)
+
+    def __contains__(self, sprite):
+        return sprite in self._layer_of
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def ordered(self):
+        """
+        Return every sprite, bottom to top, as a tuple. The same tuple is
+        handed out until the registry changes, so it is safe to keep
+        iterating over it while sprites are added or removed.
+        """
+        if self._order is None:
+            order = []
+            for layer in sorted(self._layers):
+                order.extend(self._layers[layer])
+            self._order = tuple(order)
+        return self._order
+
+    def active(self):
+        """Like ordered(), but leaving out the static sprites."""
+        if self._active is None:
+            static = self._static
+            if static:
+                self._active = tuple([sprite for sprite in self.ordered()
+                                      if sprite not in static])
+            else:
+                self._active = self.ordered()
+        return self._active
+
+    def statics(self):
+        """Return the static sprites, bottom to top."""
+        static = self._static
+        return tuple([sprite for sprite in self.ordered() if sprite in static])
+
+    def is_static(self, sprite):
+        return sprite in self._static
+
+    def layer_of(self, sprite):
+        return self._layer_of.get(sprite)
+
+    def find(self, key):
+        """
+        Return a tuple of the sprites indexed under key (a class or a
+        tag), in the order they were added.
+        """
+        return tuple(self._index.get(key, ()))
+
+    def _add_keys(self, sprite):
+        keys = type(sprite).__mro__[:-1] + tuple(sprite._tags)
+        self._keys_of[sprite] = keys
+        index = self._index
+        for key in keys:
+            members = index.get(key)
+            if members is None:
+                members = index[key] = collections.OrderedDict()
+            members[sprite] = None
+
+    def _remove_keys(self, sprite):
+        index = self._index
+        for key in self._keys_of.pop(sprite):
+            members = index[key]
+            del members[sprite]
+            if not members:
+                del index[key]
+
+    def reindex(self, sprite):
+        """Index a registered sprite again after its tags changed."""
+        if sprite in self._layer_of:
+            self._remove_keys(sprite)
+            self._add_keys(sprite)
+
+    def _place(self, sprite, layer, members=None):
+        """Put sprite on top of a layer, or install a rebuilt layer."""
+        if members is None:
+            members = self._layers.get(layer)
+            if members is None:
+                members = collections.OrderedDict()
+            members[sprite] = None
+        self._layers[layer] = members
+        self._layer_of[sprite] = layer
+        self._order = self._active = None
+
+    def _unplace(self, sprite):
+        layer = self._layer_of.pop(sprite)
+        members = self._layers[layer]
+        del members[sprite]
+        if not members:
+            del self._layers[layer]
+        self._order = self._active = None
+        return layer
+
+    def add(self, sprite, layer=0, static=False):
+        """Put a sprite on top of its layer (moving it if already there)."""
+        self.remove(sprite)
+        self._place(sprite, layer)
+        self._add_keys(sprite)
+        if static:
+            self._static[sprite] = None
+
+    def remove(self, sprite):
+        """Remove a sprite. Returns False if it wasn't registered."""
+        if sprite not in self._layer_of:
+            return False
+        self._unplace(sprite)
+        self._remove_keys(sprite)
+        self._static.pop(sprite, None)
+        return True
+
+    def move_to_layer(self, sprite, layer):
+        self._unplace(sprite)
+        self._place(sprite, layer)
+
+    def _insert(self, sprite, neighbour, after):
+        """Place sprite right after (or before) neighbour, in its layer."""
+        self._unplace(sprite)
+        layer = self._layer_of[neighbour]
+        members = collections.OrderedDict()
+        for other in self._layers[layer]:
+            if other is neighbour and not after:
+                members[sprite] = None
+            members[other] = None
+            if other is neighbour and after:
+                members[sprite] = None
+        self._place(sprite, layer, members)
+        # The sprite joined its neighbour's layer.
+        sprite._layer = layer
+
+    def elevate(self, sprite, above=None):
+        if above is None:
+            self.move_to_layer(sprite, self._layer_of[sprite])
+        else:
+            self._insert(sprite, above, after=True)
+
+    def lower(self, sprite, below=None):
+        if below is None:
+            layer = self._unplace(sprite)
+            members = collections.OrderedDict.fromkeys([sprite])
+            members.update(self._layers.get(layer, ()))
+            self._place(sprite, layer, members)
+        else:
+            self._insert(sprite, below, after=False)
+
+    def clear(self):
+        """Remove every sprite, returning them bottom to top."""
+        removed = self.ordered()
+        self._layers = {}
+        self._layer_of = {}
+        self._order = self._active = ()
+        self._static = {}
+        self._index = {}
+        self._keys_of = {}
+        return removed
+
+
+###############################################################################
+## FrameStats class ###########################################################
+###############################################################################
+##
+## What the Screen did to get one frame onto the display. An instance is
+## handed to the Screen's frame_hook after every frame, so the present
+## strategy can be tuned on the actual hardware. The same instance is
+## reused every frame: copy out whatever you want to keep.
+##
+###############################################################################
+
+class FrameStats(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Number of blits made onto the display.
+        self.blits = 0
+        # Dirty rectangles before and after merging.
+        self.raw_rects = 0
+        self.rects = 0
+        # Area (in pixels) passed to pygame.display.update.
+        self.area = 0
+        # Sprites left out of the repaint because they lie entirely
+        # outside the display.
+        self.culled = 0
+        # "none", "partial" (a list of rectangles) or "full"
+        self.strategy = "none"
+
+    def __repr__(self):
+        return ("<FrameStats %s: %d blits, %d rects (%d raw), %d pixels, "
+                "%d culled>" %
+                (self.strategy, self.blits, self.rects, self.raw_rects,
+                 self.area, self.culled))
+
+
 ############################################################################### 
 ## Screen class ############################################################### 
 ############################################################################### 
@@ -179,7 +529,7 @@ class Screen(object):
  
     initialized = 0 
  
-    def __init__ (self, width=640, height=480, fps=50): 
+    def __init__ (self, width=640, height=480, fps=50, cell_size=64): 
         # Bomb if you try this more than once
         if Screen.initialized: 
             raise GamesError("Cannot have more than on Screen object") 
@@ -191,11 +541,31 @@ class Screen(object):
         self._width = width  
         self._height = height
         self._background = self._display.convert()
+        # The background with the static sprites composited onto it; it is
+        # what sprites are erased with. Rebaked when marked stale.
+        self._backdrop = self._background
+        self._backdrop_stale = 0
  
-        # Initialize a list of objects in play 
-        self._objects = [] 
+        # Initialize the registry of objects in play 
+        self._objects = SpriteRegistry() 
+        # Broadphase grid used by overlapping_objects()
+        self._grid = SpatialHash(cell_size)
         # Initialize list dirty rectangles to be repainted 
         self._dirtyrects = [] 
+        # Sprites whose position, image or visibility changed since they
+        # were last drawn, and areas vacated by removed sprites.
+        self._changed = {}
+        self._damage = []
+        # Set when the whole display must be redrawn on the next frame.
+        self._redraw_all = 1
+
+        # Dirty rectangles closer than merge_distance pixels are merged;
+        # once they cover more than full_update_threshold of the display,
+        # it is updated in one go instead.
+        self._merge_distance = 8
+        self._full_update_threshold = 0.5
+        self._stats = FrameStats()
+        self._frame_hook = None
  
         # Time when we should draw the next frame 
         self._next_tick = 0
@@ -223,6 +593,42 @@ class Screen(object):
     
     fps = property(get_fps)
 
+    ## merge_distance
+    def get_merge_distance(self):
+        return self._merge_distance
+
+    def set_merge_distance(self, new_distance):
+        self._merge_distance = new_distance
+
+    merge_distance = property(get_merge_distance, set_merge_distance)
+
+    ## full_update_threshold
+    def get_full_update_threshold(self):
+        return self._full_update_threshold
+
+    def set_full_update_threshold(self, new_threshold):
+        """ 
+        Fraction of the display (0 to 1) the merged dirty rectangles may
+        cover before the whole display is updated at once.
+        """
+        self._full_update_threshold = new_threshold
+
+    full_update_threshold = property(get_full_update_threshold,
+                                     set_full_update_threshold)
+
+    ## frame_hook
+    def get_frame_hook(self):
+        return self._frame_hook
+
+    def set_frame_hook(self, new_hook):
+        """ 
+        Set a function to be called with a FrameStats object after every
+        frame (None to stop).
+        """
+        self._frame_hook = new_hook
+
+    frame_hook = property(get_frame_hook, set_frame_hook)
+
     ## background
     def get_background(self):
         return self._background
@@ -238,7 +644,7 @@ class Screen(object):
             for y in range(0, self._height, new_background.get_height()): 
                 self._background.blit(new_background, (x, y)) 
                  
-        self._display.blit(self._background, (0,0)) 
+        self._bake()
         pygame.display.update()
 
     background = property(get_background, set_background)
@@ -246,11 +652,25 @@ class Screen(object):
     ## all objects
     def get_all_objects(self): 
         """ 
-        Returns a list of all the Sprites on the Screen. 
+        Returns a tuple of all the Sprites on the Screen, bottom to top.
+        It is not copied on every call, so treat it as read-only.
         """ 
-        return self._objects[:]
+        return self._objects.ordered()
     all_objects = property(get_all_objects)
 
+    def tagged(self, tag):
+        """ 
+        Returns a tuple of the Sprites on the Screen carrying the tag.
+        """ 
+        return self._objects.find(tag)
+
+    def instances_of(self, cls):
+        """ 
+        Returns a tuple of the Sprites on the Screen which are instances
+        of cls (or of a subclass of it).
+        """ 
+        return self._objects.find(cls)
+
     ## event_grab
     def get_event_grab(self):
         return pygame.event.get_grab()
@@ -301,19 +721,74 @@ class Screen(object):
  
     def clear(self):
         """
-        Destroy all objects on this Screen.
+        Destroy all objects on this Screen. Rather than erasing them one
+        by one, the whole background is blitted once.
         """
-        for object in self._objects[:]:
+        for object in self._objects.ordered():
             object.destroy()
-        self._objects = []
+        # Anything a destroy() override left behind goes too.
+        for object in self._objects.clear():
+            object._gone = 1
+            object._drawn_rect = None
+        self._grid.clear()
+        # Drop the areas each destroy() erased: _bake repaints everything.
+        self._changed = {}
+        self._damage = []
+        self._bake()
+
+    def invalidate(self):
+        """
+        Draw every sprite again on the next frame. Call this after
+        drawing straight onto the display, which the Screen's change
+        tracking cannot know about.
+        """
+        self._redraw_all = 1
+
+    def _bake(self):
+        """
+        Composite the static sprites onto a copy of the background, and
+        repaint the whole display with the result.
+        """
+        statics = self._objects.statics()
+        if statics:
+            backdrop = self._background.copy()
+            for sprite in statics:
+                if sprite._visible:
+                    backdrop.blit(sprite._surface, sprite._rect)
+        else:
+            backdrop = self._background
+        self._backdrop = backdrop
+        self._backdrop_stale = 0
+        self._display.blit(backdrop, (0, 0))
+        self._dirtyrects = [self._display.get_rect()]
+        self._stats.blits += 1
+        self._redraw_all = 1
  
     def _update_display(self):
         """
-        Get the actual display in sync with reality.
+        Get the actual display in sync with reality. Overlapping and
+        nearby dirty rectangles are merged first, and if what is left
+        covers enough of the display, it is updated as a whole.
         """
-        pygame.display.update(self._dirtyrects)
+        stats = self._stats
+        stats.raw_rects = len(self._dirtyrects)
+        rects = merge_rects(self._dirtyrects, self._merge_distance)
         self._dirtyrects = []
 
+        area = 0
+        for rect in rects:
+            area += rect.width * rect.height
+        stats.rects = len(rects)
+
+        if area > self._full_update_threshold * self._width * self._height:
+            pygame.display.update()
+            stats.strategy = "full"
+            stats.area = self._width * self._height
+        elif rects:
+            pygame.display.update(rects)
+            stats.strategy = "partial"
+            stats.area = area
+
     def mainloop(self): 
         """ 
         Run the pygame main loop. This will animate the objects on the 
@@ -324,26 +799,146 @@ class Screen(object):
         while not self._exit: 
             self._wait_frame()
 
-            for object in self._objects: 
-                object._erase()
+            if self._backdrop_stale:
+                self._bake()
 
-            # Take a copy of the _objects list as it may get changed in place. 
-            for object in self._objects[:]: 
+            # The registry hands out an immutable snapshot, so objects may
+            # be added or removed while we iterate over it. Static sprites
+            # live in the backdrop and are neither ticked nor drawn.
+            for object in self._objects.active(): 
                 if object._tickable:
                     object._tick() 
  
             self.tick() 
- 
-            for object in self._objects: 
-                object._draw()
+
+            # A static sprite was moved, added or destroyed during the tick.
+            if self._backdrop_stale:
+                self._bake()
+
+            self._redraw()
 
             self._update_display()
 
+            if self._frame_hook:
+                self._frame_hook(self._stats)
+            self._stats.reset()
+
             self.handle_events() 
  
         # Throw away any pending events.
         pygame.event.get()
  
+    def _redraw(self):
+        """
+        Bring the display up to date with the sprites. Only the areas of
+        sprites that changed since the last frame (where they were, and
+        where they are now) are repainted, together with the parts of any
+        other sprites lying in those areas.
+
+        Each phase (erasing, then drawing) is gathered into a list and
+        handed to pygame in a single blits() call.
+
+        Sprites outside the display are culled: they are still ticked,
+        but cost nothing here.
+        """
+        objects = self._objects.active()
+        display = self._display
+        on_screen = display.get_rect().colliderect
+        culled = 0
+
+        if self._redraw_all:
+            self._redraw_all = 0
+            # Wherever a sprite was drawn before moving, hiding or being
+            # destroyed still needs wiping: the display may not have been
+            # repainted since (see invalidate).
+            damage = self._damage
+            for object in self._changed:
+                if object._drawn_rect is not None:
+                    damage.append(object._drawn_rect)
+            self._changed = {}
+            self._damage = []
+            if damage:
+                damage = merge_rects(damage)
+                backdrop = self._backdrop
+                blit_all(display, [(backdrop, rect, rect) for rect in damage])
+                self._dirtyrects.extend(damage)
+            batch = []
+            for object in objects:
+                if object._visible:
+                    if not on_screen(object._rect):
+                        object._drawn_rect = None
+                        culled += 1
+                        continue
+                    rect = object._rect.copy()
+                    batch.append((object._surface, rect))
+                    object._drawn_rect = rect
+                    object._drawn_surface = object._surface
+                else:
+                    # Not on the display: showing it again must draw it.
+                    object._drawn_rect = None
+                    object._drawn_surface = None
+            blit_all(display, batch)
+            self._dirtyrects.extend([rect for surface, rect in batch])
+            self._stats.blits += len(batch)
+            self._stats.culled = culled
+            return
+
+        changed = self._changed
+        damage = self._damage
+        if not changed and not damage:
+            return
+        self._changed = {}
+        self._damage = []
+
+        for object in changed:
+            drawn_rect = object._drawn_rect
+            if object._visible:
+                # Setting a property to the value it already had is not
+                # a change worth repainting.
+                if (drawn_rect == object._rect and
+                    object._drawn_surface is object._surface):
+                    continue
+                if on_screen(object._rect):
+                    damage.append(object._rect)
+                else:
+                    culled += 1
+            if drawn_rect is not None:
+                damage.append(drawn_rect)
+            object._drawn_rect = None
+        self._stats.culled = culled
+        if not damage:
+            return
+
+        damage = merge_rects(damage)
+        backdrop = self._backdrop
+        blit_all(display, [(backdrop, rect, rect) for rect in damage])
+        self._dirtyrects.extend(damage)
+
+        # Repaint, bottom to top, whatever lies in the damaged areas.
+        # The areas don't overlap, so nothing is blitted twice.
+        batch = []
+        for object in objects:
+            if not object._visible:
+                continue
+            rect = object._rect
+            if not on_screen(rect):
+                if object not in changed:
+                    culled += 1
+                continue
+            indices = rect.collidelistall(damage)
+            if not indices:
+                continue
+            surface = object._surface
+            for index in indices:
+                clip = rect.clip(damage[index])
+                batch.append((surface, clip, clip.move(-rect.left, -rect.top)))
+            if object._drawn_rect is None:
+                object._drawn_rect = rect.copy()
+                object._drawn_surface = surface
+        blit_all(display, batch)
+        self._stats.blits += len(damage) + len(batch)
+        self._stats.culled = culled
+
     def _wait_frame (self): 
         "Wait for the correct fps time to expire" 
         this_tick = pygame.time.get_ticks() 
@@ -351,70 +946,95 @@ class Screen(object):
             pygame.time.delay(int(self._next_tick+0.5) - this_tick) 
         self._next_tick = this_tick + (1000./self._fps) 
 
-    def overlapping_objects(self, rectangle): 
+    def overlapping_objects(self, rectangle, category=ALL_CATEGORIES,
+                            collides_with=ALL_CATEGORIES): 
         """ 
         Return list of all sprites which overlap given rectangle.
+
+        category and collides_with describe whoever is asking: sprites
+        whose category is not in collides_with, or whose own mask does
+        not include category, are skipped before any rectangle test.
         """ 
         rect = pygame.Rect (rectangle)
 
-        rect_list = []
-        for obj in self._objects:
-            rect_list.append (obj._rect)
-
-        indices = rect.collidelistall (rect_list)
-
-        over_objects = [] 
-        for index in indices:
-            if (self._objects[index]).is_collideable:
-                over_objects.append (self._objects [index]) 
+        # Only the sprites sharing a grid cell with the rectangle can
+        # possibly overlap it.
+        over_objects = []
+        for obj in self._grid.query(rect):
+            if (obj._category & collides_with and
+                obj._collides_with & category and
+                obj.is_collideable and rect.colliderect(obj._rect)):
+                over_objects.append(obj)
 
         return over_objects
 
     def _elevate(self, it, above=None):
         """
-        Elevates an object to the top of the stack, or above the specified
+        Elevates an object to the top of its layer, or above the specified
         object.
         """
-        # This makes sure we're always in a consistent state.
-        objects = self._objects[:]
-        # Remove the object from the list.
-        objects.remove(it)
-        if above == None:
-            # Put it on top (the end).
-            objects.append(it)
-        else:
-            # Put the object after <above>.
-            idx = 1+objects.index(above)
-            objects[idx:idx]=[it]
-        # Install the new list.
-        self._objects = objects
+        self._objects.elevate(it, above)
+        self._restacked(it)
 
-    def _lower(self, object, below=None):
+    def _lower(self, it, below=None):
         """
-        Lower an object to the bottom of the stack, or below the specified
+        Lower an object to the bottom of its layer, or below the specified
         object.
         """
-        # This makes sure we're always in a consistent state.
-        objects = self._objects[:]
-        objects.remove(it)
-        if below == None:
-            # Put the object on the beginning (bottom) of the list.
-            self._objects = [it]+objects
-        else:
-            # Put the object before (below) the aboject.
-            idx = objects.index(below)
-            objects[idx:idx]=[it]
-            self._objects = objects
+        self._objects.lower(it, below)
+        self._restacked(it)
+
+    def _restacked(self, sprite):
+        # The sprite was drawn in its old place in the stack: repaint its
+        # area, even though it didn't move or change image.
+        objects = self._objects
+        if sprite in objects:
+            if objects.is_static(sprite):
+                self._backdrop_stale = 1
+            else:
+                sprite._drawn_surface = None
+                self._changed[sprite] = None
+
+    def add(self, sprite, layer=None, static=False):
+        """
+        Put a sprite in play, on top of the given layer. Without a layer,
+        the sprite's own layer attribute is used.
 
-    def add(self, sprite):
-        self._objects.append(sprite)
+        A static sprite is one that never moves (a net, a wall, a logo).
+        It is composited once into the backdrop, underneath every other
+        sprite, and dropped from the per-frame erase, tick and draw work.
+        Moving or destroying it rebakes the backdrop.
+        """
+        if self._objects.is_static(sprite):
+            self._backdrop_stale = 1
+        if not static:
+            self._changed[sprite] = None
+        if layer is None:
+            layer = sprite._layer
+        else:
+            sprite._layer = layer
+        self._objects.add(sprite, layer, static)
+        self._grid.insert(sprite)
+        if static:
+            self._backdrop_stale = 1
       
     def remove(self, sprite):
-        try:
-            self._objects.remove(sprite)
-        except ValueError:
-            # Already done it: happens in some games, not an error.
-            pass
+        # Removing twice happens in some games, not an error.
+        if self._objects.is_static(sprite):
+            self._backdrop_stale = 1
+        sprite._erase()
+        self._changed.pop(sprite, None)
+        self._objects.remove(sprite)
+        self._grid.remove(sprite)
+
+    def _sprite_moved(self, sprite):
+        self._grid.move(sprite)
+        objects = self._objects
+        if sprite in objects:
+            if objects.is_static(sprite):
+                self._backdrop_stale = 1
+            else:
+                self._changed[sprite] = None
 
     def blit_and_dirty (self, source_surf, dest_pos):
         """
@@ -433,6 +1053,7 @@ class Screen(object):
         """
         rect = self._display.blit(source_surf, dest_pos) 
         self._dirtyrects.append(rect)
+        self._stats.blits += 1
 
 
     def blit_background(self, rect):
@@ -442,8 +1063,9 @@ class Screen(object):
         method for what that means). It's used to erase an object before
         moving it. You shouldn't need to call it yourself.
         """
-        rect = self._display.blit(self._background, rect, rect)
+        rect = self._display.blit(self._backdrop, rect, rect)
         self._dirtyrects.append(rect)
+        self._stats.blits += 1
 
     def get_display(self):
         """ Return the 'screen' """
@@ -509,12 +1131,37 @@ class Window(object):
 ############################################################################### 
 
 class Sprite(object): 
+    # The SpritePool the sprite goes back to when destroyed, if any.
+    _pool = None
+
     def __init__(self, image, angle=0,
                  x=0, y=0,
                  top=None, bottom=None, left=None, right=None,
                  dx=0, dy=0,
-                 interval=1, is_collideable=True):
-        
+                 interval=1, is_collideable=True,
+                 category=DEFAULT_CATEGORY, collides_with=ALL_CATEGORIES,
+                 is_precise=False):
+        Sprite.reset(self, image, angle,
+                     x, y,
+                     top, bottom, left, right,
+                     dx, dy,
+                     interval, is_collideable,
+                     category, collides_with,
+                     is_precise)
+
+    def reset(self, image, angle=0,
+              x=0, y=0,
+              top=None, bottom=None, left=None, right=None,
+              dx=0, dy=0,
+              interval=1, is_collideable=True,
+              category=DEFAULT_CATEGORY, collides_with=ALL_CATEGORIES,
+              is_precise=False):
+        """
+        Set the sprite up as the constructor does, with the same
+        arguments. A destroyed sprite can be reset and added to the
+        screen again instead of making a new one (see SpritePool).
+        Subclasses that are pooled take their own constructor's arguments.
+        """
         if not Screen.initialized: 
             raise GamesError("Screen object must be intialized before any Sprite object") 
  
@@ -522,6 +1169,11 @@ class Sprite(object):
         self._orig_surface = image    # Surface before any rotation 
         self._rect = self._surface.get_rect() 
 
+        # Where (and with which surface) the sprite was last drawn.
+        self._drawn_rect = None
+        self._drawn_surface = None
+        self._visible = True
+
         self.position = (x, y)
 
         if top != None:
@@ -540,6 +1192,12 @@ class Sprite(object):
             self._rotate() 
 
         self.is_collideable = is_collideable
+        self.category = category
+        self.collides_with = collides_with
+        self.is_precise = is_precise
+
+        self._layer = 0
+        self._tags = frozenset()
 
         self._interval = interval 
         self._tickable = 1 
@@ -556,13 +1214,18 @@ class Sprite(object):
         Draw object on screen by blitting the image onto the screen. 
         """ 
         screen.blit_and_dirty(self._surface, self._rect)
+        self._drawn_rect = self._rect.copy()
+        self._drawn_surface = self._surface
 
     def _erase(self): 
         """ 
-        Erase object from screen by blitting the background over where  
-        it was. 
+        Erase object from screen: the place where it was last drawn is
+        repainted with the background (and whatever else lies there) on
+        the next frame.
         """
-        screen.blit_background(self._rect)
+        if self._drawn_rect is not None:
+            screen._damage.append(self._drawn_rect)
+            self._drawn_rect = None
  
     def _replace(self, new_surface): 
         x, y = self.position 
@@ -570,8 +1233,18 @@ class Sprite(object):
         self._rect = self._surface.get_rect() 
         self.position = (x, y)
 
+    def _moved(self):
+        """
+        Called whenever the sprite's rectangle, image or visibility
+        changes, so the Screen can keep its spatial hash and static
+        backdrop up to date, and repaint the sprite on the next frame.
+        """
+        screen._sprite_moved(self)
+
     def _rotate(self): 
-        self._replace(pygame.transform.rotate(self._orig_surface, -self._angle))
+        surface = rotation_cache.rotate(self._orig_surface, self._angle)
+        if surface is not self._surface:
+            self._replace(surface)
 
     def _tick(self):
         self._next = self._next + 1 
@@ -598,8 +1271,25 @@ class Sprite(object):
     def overlaps(self, other):
         if not self.is_collideable or not other.is_collideable:
             return False
+        elif not (self._collides_with & other._category and
+                  other._collides_with & self._category):
+            return False
+        elif not self._rect.colliderect(other._rect):
+            return False
+        elif self._is_precise or other._is_precise:
+            return self._pixels_overlap(other)
         else:
-            return self._rect.colliderect(other._rect) 
+            return True
+
+    def _pixels_overlap(self, other):
+        """
+        Test the opaque pixels of both sprites against each other. Only
+        worth calling once their rectangles are known to intersect.
+        """
+        offset = (other._rect.left - self._rect.left,
+                  other._rect.top - self._rect.top)
+        return get_mask(self._surface).overlap(get_mask(other._surface),
+                                               offset) is not None
      
     def elevate(self, above=None):
         """
@@ -620,9 +1310,11 @@ class Sprite(object):
         Erase object from screen and remove it from the list of objects 
         maintained by games module. 
         """
-        self._erase()
         screen.remove(self) 
         self._gone = 1
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.release(self)
 
     #------Properties--------#
 
@@ -632,6 +1324,7 @@ class Sprite(object):
     def set_x(self, new_x):
         self._x = new_x
         self._rect.centerx = int(self._x)
+        self._moved()
     x = property(get_x, set_x)
 
     ## y
@@ -640,13 +1333,16 @@ class Sprite(object):
     def set_y(self, new_y):
         self._y = new_y
         self._rect.centery = int(self._y)
+        self._moved()
     y = property(get_y, set_y)
 
     ## position
     def get_position(self):
         return ( (self.x, self.y) )
     def set_position(self, new_position):
-        self.x, self.y = new_position
+        self._x, self._y = new_position
+        self._rect.center = (int(self._x), int(self._y))
+        self._moved()
     position = property(get_position, set_position)
 
     ## dx
@@ -676,6 +1372,7 @@ class Sprite(object):
     def set_left(self, new_left):
         self._rect.left = new_left
         self._x = self._rect.centerx
+        self._moved()
     left = property(get_left, set_left)
 
     ## right
@@ -684,6 +1381,7 @@ class Sprite(object):
     def set_right(self, new_right):
         self._rect.right = new_right
         self._x = self._rect.centerx
+        self._moved()
     right = property(get_right, set_right)
 
     ## top
@@ -692,6 +1390,7 @@ class Sprite(object):
     def set_top(self, new_top):
         self._rect.top = new_top
         self._y = self._rect.centery
+        self._moved()
     top = property(get_top, set_top)
 
     ## bottom
@@ -700,6 +1399,7 @@ class Sprite(object):
     def set_bottom(self, new_bottom):
         self._rect.bottom = new_bottom
         self._y = self._rect.centery
+        self._moved()
     bottom = property(get_bottom, set_bottom)
 
     ## angle
@@ -714,6 +1414,8 @@ class Sprite(object):
     def get_image(self):
         return self._orig_surface
     def set_image(self, new_image): 
+        if new_image is self._orig_surface:
+            return
         self._orig_surface = new_image 
         if self._angle != 0: 
             self._rotate() 
@@ -721,6 +1423,15 @@ class Sprite(object):
             self._replace(new_image) 
     image = property(get_image, set_image)
 
+    ## is_visible
+    def get_is_visible(self):
+        return self._visible
+    def set_is_visible(self, new_visibility):
+        if new_visibility != self._visible:
+            self._visible = new_visibility
+            self._moved()
+    is_visible = property(get_is_visible, set_is_visible)
+
     ## height
     def get_height(self):
         return self._surface.get_height()
@@ -738,15 +1449,58 @@ class Sprite(object):
         self._is_collideable = new_status
     is_collideable = property(get_is_collideable, set_is_collideable)
 
+    ## category
+    def get_category(self):
+        return self._category
+    def set_category(self, new_category):
+        self._category = new_category
+    category = property(get_category, set_category)
+
+    ## collides_with
+    def get_collides_with(self):
+        return self._collides_with
+    def set_collides_with(self, new_mask):
+        self._collides_with = new_mask
+    collides_with = property(get_collides_with, set_collides_with)
+
+    ## is_precise
+    def get_is_precise(self):
+        return self._is_precise
+    def set_is_precise(self, new_status):
+        self._is_precise = new_status
+    is_precise = property(get_is_precise, set_is_precise)
 
     ## overlapping_sprites
     def get_overlapping_sprites(self): 
-        overlapping = screen.overlapping_objects(self._rect)
+        overlapping = screen.overlapping_objects(self._rect,
+                                                 self._category,
+                                                 self._collides_with)
         if self in overlapping:
             overlapping.remove(self)
-        return overlapping
+        # Rectangles were tested first; pixel masks only for the hits.
+        return [other for other in overlapping
+                if not (self._is_precise or other._is_precise)
+                or self._pixels_overlap(other)]
     overlapping_sprites = property(get_overlapping_sprites)
 
+    ## layer
+    def get_layer(self):
+        return self._layer
+    def set_layer(self, new_layer):
+        self._layer = new_layer
+        if self in screen._objects:
+            screen._objects.move_to_layer(self, new_layer)
+            screen._restacked(self)
+    layer = property(get_layer, set_layer)
+
+    ## tags
+    def get_tags(self):
+        return self._tags
+    def set_tags(self, new_tags):
+        self._tags = frozenset(new_tags)
+        screen._objects.reindex(self)
+    tags = property(get_tags, set_tags)
+
     ## interval
     def get_interval(self):
         return self._interval
@@ -764,18 +1518,29 @@ class Text(Sprite):
                  top=None, bottom=None, left=None, right=None,
                  dx=0, dy=0,
                  interval=1, is_collideable=True):
+        Text.reset(self, value, size, color, angle,
+                   x, y,
+                   top, bottom, left, right,
+                   dx, dy,
+                   interval, is_collideable)
+
+    def reset(self, value, size, color, angle=0,
+              x=0, y=0,
+              top=None, bottom=None, left=None, right=None,
+              dx=0, dy=0,
+              interval=1, is_collideable=True):
         self._size = size 
         self._color = color 
         self._value = value
-        self._font = pygame.font.Font(None, self._size)
-        Sprite.__init__(self, self._create_surface(), angle,
-                        x, y,
-                        top, bottom, left, right,
-                        dx, dy,
-                        interval, is_collideable)
+        self._font = get_font(None, self._size)
+        Sprite.reset(self, self._create_surface(), angle,
+                     x, y,
+                     top, bottom, left, right,
+                     dx, dy,
+                     interval, is_collideable)
 
     def _create_surface(self):
-        return self._font.render(str(self._value), 1, self._color) 
+        return render_text(self._value, self._size, self._color)
 
     #------Properties--------#
 
@@ -809,24 +1574,146 @@ class Text(Sprite):
     def set_size(self, new_size): 
         if new_size != self._size: 
             self._size = new_size
-            self._font = pygame.font.Font(None, self._size)
+            self._font = get_font(None, self._size)
             surface = self._create_surface() 
             self.image = surface
 
     size = property(get_size, set_size) 
 
 
-class Question(Text):
+class Counter(Sprite):
+    """
+    A whole number displayed on the screen, for values that change often
+    (scores...). It looks like a Text of the same size and color (bar
+    the odd pixel of spacing between digits), but the digits are only
+    rendered once, and shared by every Counter of that
+    size and color: a new value is drawn by copying them into the
+    counter's own surface, which is reused.
+    The digits are right-aligned in a surface wide enough for the given
+    number of digits, which grows if a value needs more.
+    """
     def __init__(self, value, size, color, angle=0,
                  x=0, y=0,
                  top=None, bottom=None, left=None, right=None,
                  dx=0, dy=0,
-                 interval=1, is_collideable=True, responses=()):
-        Text.__init__(self, value, size, color, angle,
+                 interval=1, is_collideable=True, digits=1):
+        Counter.reset(self, value, size, color, angle,
                       x, y,
                       top, bottom, left, right,
                       dx, dy,
-                      interval, is_collideable)    
+                      interval, is_collideable, digits)
+
+    def reset(self, value, size, color, angle=0,
+              x=0, y=0,
+              top=None, bottom=None, left=None, right=None,
+              dx=0, dy=0,
+              interval=1, is_collideable=True, digits=1):
+        self._size = size
+        self._color = color
+        self._value = int(value)
+        self._digits = digits
+        self._glyphs = _digit_glyphs(size, color)
+        Sprite.reset(self, self._create_surface(), angle,
+                     x, y,
+                     top, bottom, left, right,
+                     dx, dy,
+                     interval, is_collideable)
+
+    def _create_surface(self):
+        digits = max(self._digits, len(str(self._value)))
+        width = digits * max([glyph.get_width() for glyph in self._glyphs.values()])
+        surface = pygame.Surface((width, self._glyphs["0"].get_height()), SRCALPHA, 32)
+        # Copied over whatever the digits don't cover (quicker than fill()).
+        self._blank = pygame.Surface(surface.get_size(), SRCALPHA, 32)
+        self._blank.set_alpha(None)
+        self._compose(surface)
+        return surface
+
+    def _compose(self, surface):
+        x = surface.get_width()
+        for char in reversed(str(self._value)):
+            glyph = self._glyphs[char]
+            x -= glyph.get_width()
+            surface.blit(glyph, (x, 0))
+        if x > 0:
+            surface.blit(self._blank, (0, 0), (0, 0, x, surface.get_height()))
+        return x >= 0
+
+    def _repaint(self):
+        # The image was changed in place: the Screen would otherwise think
+        # it was already drawn as it is.
+        if self._angle != 0:
+            rotation_cache.forget(self._orig_surface)
+            self._rotate()
+        if self._surface is self._orig_surface:
+            _masks.pop(self._surface, None)
+            self._drawn_surface = None
+            self._moved()
+
+    #------Properties--------#
+
+    ## value
+    def get_value(self):
+        return self._value
+
+    def set_value(self, new_value):
+        new_value = int(new_value)
+        if new_value != self._value:
+            self._value = new_value
+            if self._compose(self._orig_surface):
+                self._repaint()
+            else:
+                self.image = self._create_surface()
+
+    value = property(get_value, set_value)
+
+    ## color
+    def get_color(self):
+        return self._color
+
+    def set_color(self, new_color):
+        if new_color != self._color:
+            self._color = new_color
+            self._glyphs = _digit_glyphs(self._size, self._color)
+            self.image = self._create_surface()
+
+    color = property(get_color, set_color)
+
+    ## size
+    def get_size(self):
+        return self._size
+
+    def set_size(self, new_size):
+        if new_size != self._size:
+            self._size = new_size
+            self._glyphs = _digit_glyphs(self._size, self._color)
+            self.image = self._create_surface()
+
+    size = property(get_size, set_size)
+
+
+class Question(Text):
+    def __init__(self, value, size, color, angle=0,
+                 x=0, y=0,
+                 top=None, bottom=None, left=None, right=None,
+                 dx=0, dy=0,
+                 interval=1, is_collideable=True, responses=()):
+        Question.reset(self, value, size, color, angle,
+                       x, y,
+                       top, bottom, left, right,
+                       dx, dy,
+                       interval, is_collideable, responses)
+
+    def reset(self, value, size, color, angle=0,
+              x=0, y=0,
+              top=None, bottom=None, left=None, right=None,
+              dx=0, dy=0,
+              interval=1, is_collideable=True, responses=()):
+        Text.reset(self, value, size, color, angle,
+                   x, y,
+                   top, bottom, left, right,
+                   dx, dy,
+                   interval, is_collideable)    
         self.responses = responses
 
     def tick(self):
@@ -841,11 +1728,22 @@ class Message(Text):
                  top=None, bottom=None, left=None, right=None,
                  dx=0, dy=0,
                  lifetime=0, is_collideable=True, after_death=None):
-        Text.__init__(self, value, size, color, angle,
+        Message.reset(self, value, size, color, angle,
                       x, y,
                       top, bottom, left, right,
                       dx, dy,
-                      lifetime, is_collideable) 
+                      lifetime, is_collideable, after_death)
+
+    def reset(self, value, size, color, angle=0,
+              x=0, y=0,
+              top=None, bottom=None, left=None, right=None,
+              dx=0, dy=0,
+              lifetime=0, is_collideable=True, after_death=None):
+        Text.reset(self, value, size, color, angle,
+                   x, y,
+                   top, bottom, left, right,
+                   dx, dy,
+                   lifetime, is_collideable) 
         self._after_death = after_death
 
     def tick(self):
@@ -860,40 +1758,47 @@ class Animation(Sprite):
     An image that changes every repeat_interval ticks.
     The n_repeats parameter is the number of complete animation cycles to show.
     If n_repeats <= 0, the animation will repeat forever.
-    You can give list of filenames or list of images.
+    You can give list of filenames, list of images, an Atlas or a FrameSet
+    (whose own durations then replace repeat_interval); the frames are
+    shared with every other Animation given the same ones (see load_frames).
     """
     def __init__(self, images, angle=0,
                  x=0, y=0,
                  top=None, bottom=None, left=None, right=None,
                  dx=0, dy=0,
                  repeat_interval=1, n_repeats=0, is_collideable=True):
-                 
-        if images and type(images[0]) is type(""):
-            images = load_animation(images)
-            
-        self.images = images
-        if self.images == []:
-            raise GamesError("An animation with no images is illegal.")
+        Animation.reset(self, images, angle,
+                        x, y,
+                        top, bottom, left, right,
+                        dx, dy,
+                        repeat_interval, n_repeats, is_collideable)
+
+    def reset(self, images, angle=0,
+              x=0, y=0,
+              top=None, bottom=None, left=None, right=None,
+              dx=0, dy=0,
+              repeat_interval=1, n_repeats=0, is_collideable=True):
+        self._frames = load_frames(images, repeat_interval)
+        self._index = -1
 
         self.n_repeats = n_repeats or -1
 
         if self.n_repeats > 0:    
-            self.n_repeats = (self.n_repeats * len(self.images))
+            self.n_repeats = (self.n_repeats * len(self._frames))
 
-        first_image = self.next_image()
-        
-        Sprite.__init__(self, self.next_image(), angle,
-                        x, y,
-                        top, bottom, left, right,
-                        dx, dy,
-                        repeat_interval, is_collideable)
+        Sprite.reset(self, self.next_image(), angle,
+                     x, y,
+                     top, bottom, left, right,
+                     dx, dy,
+                     self._frames.durations[0], is_collideable)
 
     def next_image(self):
         if self.n_repeats==0: return None
         if self.n_repeats>0: self.n_repeats -= 1
-        new_image = self.images[0]
-        self.images = self.images[1:] + [self.images[0]]
-        return new_image
+        self._index += 1
+        if self._index == len(self._frames):
+            self._index = 0
+        return self._frames[self._index]
 
     def tick(self):
         new_image = self.next_image()
@@ -901,14 +1806,982 @@ class Animation(Sprite):
             self.destroy()
         else:
             self.image = new_image
+            self.interval = self._frames.durations[self._index]
+
+    #------Properties--------#
+
+    ## frames
+    def get_frames(self):
+        return self._frames
+
+    frames = property(get_frames)
+
+    ## images
+    def get_images(self):
+        return self._frames.images
+
+    images = property(get_images)
+
+    ## index
+    def get_index(self):
+        """Position of the frame being shown in frames."""
+        return self._index
+
+    index = property(get_index)
+
+
+###############################################################################
+## SpritePool class ###########################################################
+###############################################################################
+##
+## Destroyed sprites of one class, kept to be reused. Sprites that come and
+## go all game long (falling objects, explosions, messages...) are taken
+## from the pool with acquire(), which resets a free one rather than
+## making a new one, and go back to it when destroyed (or when the screen
+## is cleared). Only sprites acquired from a pool ever go back to one.
+##
+## A class can be pooled if its reset() takes the same arguments as its
+## constructor and sets up everything the constructor does; the easiest
+## way is for __init__ to just call reset().
+##
+## Don't keep using a sprite after destroying it: once back in the pool,
+## it may be handed out again as a new one.
+##
+###############################################################################
+
+class SpritePool(object):
+    def __init__(self, cls, limit=64):
+        """
+        cls -- the class of sprite the pool makes.
+        limit -- how many free sprites may be kept; any more destroyed
+                 are left to the garbage collector.
+        """
+        self._cls = cls
+        self._limit = limit
+        self._free = []
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._free)
+
+    def acquire(self, *args, **kwargs):
+        """
+        Return a sprite set up with the given constructor arguments:
+        a free one, reset, or a new one if there is none (a miss).
+        """
+        if self._free:
+            sprite = self._free.pop()
+            sprite.reset(*args, **kwargs)
+            self.hits += 1
+        else:
+            sprite = self._cls(*args, **kwargs)
+            self.misses += 1
+        sprite._pool = self
+        return sprite
+
+    def release(self, sprite):
+        """Take back a destroyed sprite (Sprite.destroy does this)."""
+        if len(self._free) < self._limit:
+            self._free.append(sprite)
+        else:
+            self.dropped += 1
+
+    def clear(self):
+        """Let go of every free sprite."""
+        self._free = []
+
+    #------Properties--------#
+
+    ## cls
+    def get_cls(self):
+        return self._cls
+
+    cls = property(get_cls)
+
+    ## limit
+    def get_limit(self):
+        return self._limit
+
+    def set_limit(self, new_limit):
+        self._limit = new_limit
+        del self._free[new_limit:]
+
+    limit = property(get_limit, set_limit)
+
+
+###############################################################################
+## AssetCache class ###########################################################
+###############################################################################
+##
+## Loaded assets (decoded images, sounds...) kept in memory so that asking
+## for the same file twice doesn't touch the disk again. When the assets
+## add up to more than the byte budget, the least recently used ones are
+## dropped from the cache (anything still using them keeps working).
+##
+###############################################################################
+
+class AssetCache(object):
+    def __init__(self, budget):
+        self._budget = budget
+        # key -> (asset, size in bytes), least recently used first
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached asset, or None (counted as a miss)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, asset, size):
+        self.evict(key)
+        self._entries[key] = (asset, size)
+        self._size += size
+        self._shrink()
+
+    def evict(self, key):
+        """Drop an asset from the cache. Returns False if it wasn't there."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._size -= entry[1]
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def items(self):
+        """Return a list of (key, asset, size in bytes), oldest first."""
+        return [(key, asset, size) for key, (asset, size) in self._entries.items()]
+
+    def _shrink(self):
+        # The most recent asset is always kept, even if it alone is over
+        # the budget.
+        entries = self._entries
+        while self._size > self._budget and len(entries) > 1:
+            key, (asset, size) = entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+
+    #------Properties--------#
+
+    ## size
+    def get_size(self):
+        return self._size
+
+    size = property(get_size)
+
+    ## budget
+    def get_budget(self):
+        return self._budget
+
+    def set_budget(self, new_budget):
+        self._budget = new_budget
+        self._shrink()
+
+    budget = property(get_budget, set_budget)
+
+
+###############################################################################
+## RotationCache class ########################################################
+###############################################################################
+##
+## Rotated copies of images, as drawn by sprites with an angle. Angles are
+## rounded to a number of degrees (the step), so a spinning sprite soon
+## finds every copy it needs already made, and only looks it up instead of
+## rotating its image again every frame. Like any AssetCache, the least
+## recently used copies are dropped past the byte budget.
+##
+## The images are used as keys, so an image must not be drawn on once it
+## has been rotated (or its copies must be dropped with forget()).
+##
+###############################################################################
+
+class RotationCache(AssetCache):
+    def __init__(self, budget, step=1):
+        AssetCache.__init__(self, budget)
+        self._step = step
+
+    def quantize(self, angle):
+        """Return the angle (in degrees) rounded to the nearest step."""
+        return (int(round(angle / self._step)) * self._step) % 360
+
+    def rotate(self, surface, angle):
+        """
+        Return the surface rotated clockwise by angle degrees (rounded to
+        the step), made the first time it is asked for. An angle that
+        rounds to 0 returns the surface itself.
+        """
+        angle = self.quantize(angle)
+        if angle == 0:
+            return surface
+        key = (surface, angle)
+        rotated = self.get(key)
+        if rotated is None:
+            rotated = pygame.transform.rotate(surface, -angle)
+            self.put(key, rotated, surface_size(rotated))
+        return rotated
+
+    def precompute(self, surface):
+        """
+        Make the surface's rotated copy for every step (e.g. at load time
+        for an image that will spin), stopping before the budget would be
+        exceeded. Returns the number of copies cached.
+        """
+        count = 0
+        for angle in range(self._step, 360, self._step):
+            if (surface, angle) not in self:
+                rotated = pygame.transform.rotate(surface, -angle)
+                size = surface_size(rotated)
+                if self.size + size > self.budget:
+                    break
+                self.put((surface, angle), rotated, size)
+            count += 1
+        return count
+
+    def forget(self, surface):
+        """Drop every rotated copy of the surface (e.g. after drawing on it)."""
+        for (key, rotated, size) in self.items():
+            if key[0] is surface:
+                self.evict(key)
+
+    #------Properties--------#
+
+    ## step
+    def get_step(self):
+        return self._step
+
+    def set_step(self, new_step):
+        """Copies made for the old step are dropped."""
+        if new_step != self._step:
+            self._step = new_step
+            self.clear()
+
+    step = property(get_step, set_step)
+
+
+###############################################################################
+## SoundBank class ############################################################
+###############################################################################
+##
+## Every sound file is decoded once, and the resulting pygame Sound is
+## shared by everyone who asks for it (a Sound can play on several
+## channels at once). Games hand a manifest of the sounds they use to
+## preload() so that nothing is decoded during play.
+##
+###############################################################################
+
+class SoundBank(object):
+    def __init__(self):
+        # filename -> Sound
+        self._sounds = {}
+        # filename -> (seconds spent decoding, bytes of sample data)
+        self._stats = {}
+
+    def __len__(self):
+        return len(self._sounds)
+
+    def __contains__(self, filename):
+        return filename in self._sounds
+
+    def load(self, filename):
+        """Return the Sound for a file, decoding it the first time."""
+        sound = self._sounds.get(filename)
+        if sound is None:
+            (sound, decode_time) = self._decode(filename)
+            self._store(filename, sound, decode_time)
+        return sound
+
+    def _decode(self, filename):
+        # Safe to call from a worker thread (see preload_assets).
+        start = time.perf_counter()
+        sound = None
+        try:
+            if archive is not None:
+                sound = archive.sound(filename)
+            if sound is None:
+                sound = pygame.mixer.Sound(filename)
+        except pygame.error:
+            raise GamesError('Could not load sound "%s" %s' %
+                             (filename, pygame.get_error()))
+        return (sound, time.perf_counter() - start)
+
+    def _store(self, filename, sound, decode_time):
+        _track((filename, "sound"), sound)
+        self._sounds[filename] = sound
+        self._stats[filename] = (decode_time, sound_size(sound))
+
+    def preload(self, manifest):
+        """Decode every sound listed in the manifest (a list of filenames)."""
+        for filename in manifest:
+            self.load(filename)
+
+    def unload(self, manifest):
+        for filename in manifest:
+            self._sounds.pop(filename, None)
+            self._stats.pop(filename, None)
+
+    def report(self):
+        """
+        Return a list of (filename, seconds spent decoding, bytes) tuples,
+        one per loaded sound.
+        """
+        return [(filename, decode_time, size)
+                for filename, (decode_time, size) in sorted(self._stats.items())]
+
+    #------Properties--------#
+
+    ## decode_time
+    def get_decode_time(self):
+        return sum([decode_time for decode_time, size in self._stats.values()])
+
+    decode_time = property(get_decode_time)
+
+    ## size
+    def get_size(self):
+        return sum([size for decode_time, size in self._stats.values()])
+
+    size = property(get_size)
+
+
+###############################################################################
+## Prefetcher class ###########################################################
+###############################################################################
+##
+## Loads the assets of a manifest in the background, a few files at a
+## time, while the game carries on (e.g. the menu prefetches the game the
+## cursor is on). Asking for another manifest drops whatever was being
+## prefetched for the last one. Call poll() every frame: finished assets
+## are stored in the caches there, on the main thread, and more files are
+## started. Music is read into music_cache, so Music.load streams it from
+## memory.
+##
+## At most budget bytes (going by the sizes of the files) are in flight
+## at once; anything beyond that waits for earlier files to finish.
+##
+###############################################################################
+
+class Prefetcher(object):
+    def __init__(self, budget=8 * 1024 * 1024, workers=2):
+        self._budget = budget
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers)
+        # Keys not started yet, in manifest order.
+        self._waiting = []
+        # [key, future, estimated bytes, still wanted], one per file in flight.
+        self._jobs = []
+        self.finished = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def prefetch(self, manifest):
+        """Start loading whatever the manifest lists that isn't loaded yet."""
+        self.cancel()
+        self._waiting = [key for key in _manifest_keys(manifest) if not _is_loaded(key)]
+        self._start()
+
+    def cancel(self):
+        """Drop everything being prefetched. Files already being read are
+        finished (they can't be interrupted) but thrown away."""
+        self.cancelled += len(self._waiting)
+        self._waiting = []
+        for job in self._jobs:
+            if job[3]:
+                job[3] = False
+                self.cancelled += 1
+            job[1].cancel()
+
+    def poll(self):
+        """Store the assets that have finished loading, and start more."""
+        for job in [job for job in self._jobs if job[1].done()]:
+            self._jobs.remove(job)
+            (key, future, size, wanted) = job
+            if not wanted:
+                continue
+            try:
+                data = future.result()
+            except (GamesError, EnvironmentError):
+                # Left for the game's own load to report.
+                self.failed += 1
+                continue
+            if not _is_loaded(key):
+                _store_asset(key, data)
+            self.finished += 1
+        # Assets in the archive are only a copy away: loaded right here.
+        for key in [key for key in self._waiting if _archived(key)]:
+            self._waiting.remove(key)
+            if not _is_loaded(key):
+                try:
+                    _load_asset(key)
+                except (GamesError, EnvironmentError):
+                    self.failed += 1
+                    continue
+            self.finished += 1
+        self._start()
+
+    def _start(self):
+        # Only files read from the disk go to the threads (see poll).
+        for key in [key for key in self._waiting if not _archived(key)]:
+            if self.get_size() >= self._budget:
+                break
+            self._waiting.remove(key)
+            self._jobs.append([key, self._pool.submit(_read_asset, key),
+                               _file_size(key[0]), True])
+
+    def close(self):
+        self.cancel()
+        self._pool.shutdown(False)
+
+    #------Properties--------#
+
+    ## size
+    def get_size(self):
+        return sum([job[2] for job in self._jobs])
+
+    size = property(get_size)
+
+    ## busy
+    def get_busy(self):
+        return bool(self._waiting or [job for job in self._jobs if job[3]])
+
+    busy = property(get_busy)
+
+    ## budget
+    def get_budget(self):
+        return self._budget
+
+    def set_budget(self, budget):
+        self._budget = budget
+
+    budget = property(get_budget, set_budget)
+
+
+###############################################################################
+## Atlas class ################################################################
+###############################################################################
+##
+## A sprite sheet: many images (the frames of an animation, the variants
+## of an object...) packed into one surface, plus a table saying where
+## each one is. The frames are subsurfaces of the sheet, so they share its
+## pixels: one file to decode, one block of memory to blit from.
+##
+## Every frame's background is stored as magenta (Atlas.COLORKEY), so the
+## whole sheet can use one colorkey whatever the original corner colors
+## were. Build sheets with build_atlas.py; load them with load_atlas().
+##
+###############################################################################
+
+class Atlas(object):
+    COLORKEY = (255, 0, 255)
+
+    def __init__(self, sheet, frames):
+        """
+        sheet -- the pygame.Surface holding every frame. It must not be
+                 RLE accelerated, since the frames point into its pixels.
+        frames -- a sequence of (name, rect) pairs, in table order.
+        """
+        self._sheet = sheet
+        self._names = []
+        self._frames = {}
+        for (name, rect) in frames:
+            frame = _apply_format(sheet.subsurface(rect), "colorkey", Atlas.COLORKEY)
+            self._names.append(name)
+            self._frames[name] = frame
+
+    def __getitem__(self, name):
+        try:
+            return self._frames[name]
+        except KeyError:
+            raise GamesError('No frame named "%s" in the atlas' % name)
+
+    def __contains__(self, name):
+        return name in self._frames
+
+    def __len__(self):
+        return len(self._names)
+
+    def images(self, names=None):
+        """
+        Returns a list of frames, as needed by Animation: the named ones,
+        or every frame in table order if no names are given.
+        """
+        if names is None:
+            names = self._names
+        return [self[name] for name in names]
+
+    def get_names(self):
+        return list(self._names)
+
+    def get_sheet(self):
+        return self._sheet
+
+    names = property(get_names)
+
+    sheet = property(get_sheet)
+
+    def build(path, filenames, width=1024):
+        """
+        Packs the images into a new sheet at path (which should be a .png)
+        and writes its frame table next to it, with the same name ending in
+        .txt. Each frame is named after its file, without the extension.
+        Returns the number of frames.
+
+        width -- the widest the sheet may be (it is widened to fit the
+                 widest image). Every width up to that is tried, and the
+                 one giving the smallest sheet is kept; the sheet is
+                 cropped to the frames.
+        """
+        frames = []
+        for filename in filenames:
+            try:
+                image = pygame.image.load(filename)
+            except pygame.error:
+                raise GamesError('Could not load image "%s" %s'%(filename, pygame.get_error()))
+            corner = image.get_at((0, 0))
+            frame = image.convert(24)
+            if pygame.mask.from_threshold(frame, Atlas.COLORKEY, (1, 1, 1, 255)).count():
+                raise GamesError('"%s" uses the atlas colorkey %s' % (filename, Atlas.COLORKEY))
+            pixels = pygame.PixelArray(frame)
+            pixels.replace(corner[:3], Atlas.COLORKEY)
+            del pixels
+            name = os.path.splitext(os.path.basename(filename))[0]
+            frames.append((name, frame))
+
+        sizes = [(name, frame.get_size()) for (name, frame) in frames]
+        widest = max([size[0] for (name, size) in sizes])
+        widths = range(widest, max(widest, min(width, sum([size[0] for (name, size) in sizes]))) + 1)
+        best = None
+        for order in (lambda entry: (-entry[1][1], -entry[1][0]),
+                      lambda entry: (-entry[1][0], -entry[1][1])):
+            ordered = sorted(sizes, key=order)
+            for sheet_width in widths:
+                packed = _pack(ordered, sheet_width)
+                if best is None or packed[0].width * packed[0].height < best[0].width * best[0].height:
+                    best = packed
+        (bounds, rects) = best
+
+        sheet = pygame.Surface(bounds.size, 0, 24)
+        sheet.fill(Atlas.COLORKEY)
+        for (name, frame) in frames:
+            sheet.blit(frame, rects[name])
+        pygame.image.save(sheet, path)
+
+        table = open(_atlas_table(path), "w")
+        for (name, frame) in frames:
+            table.write("%s %d %d %d %d\n" % ((name,) + tuple(rects[name])))
+        table.close()
+        return len(frames)
+
+    build = staticmethod(build)
+
+
+def _atlas_table(filename):
+    return os.path.splitext(filename)[0] + ".txt"
+
+def _pack(sizes, width):
+    # Bottom-left skyline packing: each (name, size), in the order given,
+    # goes wherever its top edge ends up lowest (then leftmost) on the
+    # outline left by the frames already placed. Returns the bounding
+    # rect of the frames and a dict of name -> rect.
+    skyline = [(0, width, 0)]    # (x, width, height) segments, left to right
+    rects = {}
+    bounds = pygame.Rect(0, 0, 0, 0)
+    for (name, (w, h)) in sizes:
+        spot = None
+        for (i, (x, segment_width, segment_y)) in enumerate(skyline):
+            if x + w > width:
+                break
+            # The frame rests on the highest segment under it.
+            y = 0
+            end = x + w
+            for (other_x, other_width, other_y) in skyline[i:]:
+                if other_x >= end:
+                    break
+                y = max(y, other_y)
+            if spot is None or y < spot[1]:
+                spot = (x, y)
+        (x, y) = spot
+        rects[name] = pygame.Rect(x, y, w, h)
+        bounds.union_ip(rects[name])
+        outline = []
+        for (other_x, other_width, other_y) in skyline:
+            other_end = other_x + other_width
+            if other_end <= x or other_x >= x + w:
+                outline.append((other_x, other_width, other_y))
+                continue
+            if other_x < x:
+                outline.append((other_x, x - other_x, other_y))
+            if other_end > x + w:
+                outline.append((x + w, other_end - x - w, other_y))
+        outline.append((x, w, y + h))
+        outline.sort()
+        skyline = outline
+    return (bounds, rects)
+
+
+###############################################################################
+## FrameSet class #############################################################
+###############################################################################
+##
+## The frames of an animation, in order, and how many ticks each one is
+## shown for. A FrameSet never changes once made, so every Animation
+## playing the same frames shares one (see load_frames) and just keeps
+## its own place in it.
+##
+###############################################################################
+
+class FrameSet(object):
+    def __init__(self, images, durations=1):
+        """
+        images -- a sequence of images (pygame.Surface objects).
+        durations -- the number of ticks each frame is shown for: one
+                     for every frame, or a sequence with one per frame.
+        """
+        self._images = tuple(images)
+        if not self._images:
+            raise GamesError("An animation with no images is illegal.")
+        if isinstance(durations, (int, float)):
+            durations = (durations,) * len(self._images)
+        self._durations = tuple(durations)
+        if len(self._durations) != len(self._images):
+            raise GamesError("%d durations given for %d frames" %
+                             (len(self._durations), len(self._images)))
+
+    def __len__(self):
+        return len(self._images)
+
+    def __getitem__(self, index):
+        return self._images[index]
+
+    def get_images(self):
+        return self._images
+
+    def get_durations(self):
+        return self._durations
+
+    def get_length(self):
+        """Ticks taken to show every frame once."""
+        return sum(self._durations)
+
+    images = property(get_images)
+    durations = property(get_durations)
+    length = property(get_length)
+
+
+###############################################################################
+## AssetArchive class #########################################################
+###############################################################################
+##
+## All of the arcade's images, sounds and text manifests packed into one
+## file, which is memory-mapped instead of opening and decoding hundreds
+## of small files. Images are stored already converted to the display's
+## pixel format (with the colorkey they would get from load_image) and
+## sounds already decoded to the mixer's PCM format, so loading one is a
+## single copy out of the mapped file.
+##
+## Build an archive with build_assets.py. If the display or mixer format
+## it was built for doesn't match the running one, the archive is ignored
+## and the loose files are used instead.
+##
+###############################################################################
+
+class AssetArchive(object):
+    MAGIC = b"PYARCADE-ASSETS-1\n"
+
+    IMAGE_TYPES = (".png", ".bmp", ".gif", ".jpg", ".jpeg", ".tga")
+
+    SOUND_TYPES = (".wav", ".ogg")
+
+    TEXT_TYPES = (".txt",)
+
+    def __init__(self, path):
+        archive = open(path, "rb")
+        try:
+            self._map = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            archive.close()
+
+        magic = self.MAGIC
+        if self._map[:len(magic)] != magic:
+            raise GamesError('"%s" is not an asset archive' % path)
+        start = len(magic) + 8
+        (header_size,) = struct.unpack("<Q", self._map[len(magic):start])
+        header = json.loads(self._map[start:start + header_size].decode("utf-8"))
+        # Entry offsets count from the end of the header.
+        self._data = memoryview(self._map)[start + header_size:]
+        self._entries = header["entries"]
+
+        display = pygame.display.get_surface()
+        self._images_usable = (display is not None and
+                               header["display"] == _display_format(display))
+        self._sounds_usable = (header["mixer"] is not None and
+                               list(pygame.mixer.get_init() or ()) == header["mixer"])
+
+    def __contains__(self, filename):
+        return _archive_name(filename) in self._entries
+
+    def _entry(self, filename, kind):
+        entry = self._entries.get(_archive_name(filename))
+        if entry is None or entry["kind"] != kind:
+            return None
+        return entry
+
+    def _bytes(self, entry):
+        offset = entry["offset"]
+        return self._data[offset:offset + entry["length"]]
+
+    def image(self, filename, transparent=True):
+        """Return the image as load_image would, or None if unavailable."""
+        entry = self._entry(filename, "image")
+        if entry is None or not self._images_usable:
+            return None
+        # Only the display-format pixels are stored, not per-pixel alpha.
+        if transparent and entry.get("alpha"):
+            return None
+        surface = pygame.Surface(entry["size"], 0, pygame.display.get_surface())
+        if surface.get_pitch() != entry["pitch"]:
+            return None
+        pixels = memoryview(surface.get_view("1")).cast("B")
+        pixels[:] = self._bytes(entry)
+        pixels.release()
+        if LOW_MEMORY:
+            surface = _reduce_depth(surface, transparent)
+        if transparent:
+            return _apply_format(surface, "colorkey", entry["colorkey"])
+        return _apply_format(surface, "opaque")
+
+    def sound(self, filename):
+        """Return a new Sound for the file, or None if unavailable."""
+        entry = self._entry(filename, "sound")
+        if entry is None or not self._sounds_usable:
+            return None
+        return pygame.mixer.Sound(buffer=self._bytes(entry))
+
+    def text(self, filename):
+        """Return the contents of a text file, or None if unavailable."""
+        entry = self._entry(filename, "text")
+        if entry is None:
+            return None
+        return self._bytes(entry).tobytes().decode("utf-8")
+
+    def close(self):
+        self._data.release()
+        self._map.close()
+
+    def build(path, directories):
+        """
+        Pack every image, sound and text file found under the given
+        directories into a new archive at path. The display and the mixer
+        must be initialized, since their formats are what gets stored.
+        """
+        display = pygame.display.get_surface()
+        if display is None:
+            raise GamesError("The display must be initialized to build an archive")
+
+        entries = {}
+        chunks = []
+        offset = 0
+        for directory in directories:
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for name in sorted(files):
+                    filename = os.path.join(root, name)
+                    entry, data = AssetArchive._pack_file(filename)
+                    if entry is None:
+                        continue
+                    entry["offset"] = offset
+                    entry["length"] = len(data)
+                    entries[_archive_name(filename)] = entry
+                    chunks.append(data)
+                    offset += len(data)
+
+        header = json.dumps({"display": _display_format(display),
+                             "mixer": list(pygame.mixer.get_init() or ()) or None,
+                             "entries": entries}).encode("utf-8")
+
+        archive = open(path, "wb")
+        archive.write(AssetArchive.MAGIC)
+        archive.write(struct.pack("<Q", len(header)))
+        archive.write(header)
+        for data in chunks:
+            archive.write(data)
+        archive.close()
+        return len(entries)
+
+    build = staticmethod(build)
+
+    def _pack_file(filename):
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in AssetArchive.IMAGE_TYPES:
+            try:
+                surface = pygame.image.load(filename)
+            except pygame.error:
+                return None, None
+            colorkey = list(surface.get_at((0, 0)))
+            alpha = analyze_image(surface, True) == "alpha"
+            surface = surface.convert()
+            return ({"kind": "image",
+                     "size": list(surface.get_size()),
+                     "pitch": surface.get_pitch(),
+                     "colorkey": colorkey,
+                     "alpha": alpha},
+                    surface.get_view("1").raw)
+        if extension in AssetArchive.SOUND_TYPES and pygame.mixer.get_init():
+            try:
+                sound = pygame.mixer.Sound(filename)
+            except pygame.error:
+                return None, None
+            return {"kind": "sound"}, sound.get_raw()
+        if extension in AssetArchive.TEXT_TYPES:
+            text = open(filename, "rb")
+            data = text.read()
+            text.close()
+            return {"kind": "text"}, data
+        return None, None
+
+    _pack_file = staticmethod(_pack_file)
+
+
+def _archive_name(filename):
+    """Archive entries are named by normalized, '/'-separated paths."""
+    return os.path.normpath(filename).replace(os.sep, "/")
+
+def _display_format(display):
+    return [display.get_bitsize(), list(display.get_masks())]
 
 
 ############################################################################### 
 ## Utility Functions 
 ############################################################################### 
+
+# Every image loaded by load_image, keyed by (filename, transparent).
+image_cache = AssetCache(32 * 1024 * 1024)
+
+# Rotated copies of images drawn at an angle, keyed by (image, angle).
+# Every 5 degrees, a sprite's full turn takes 72 copies (one degree steps
+# take 360, which for a 100x100 image is about 20MB).
+rotation_cache = RotationCache(8 * 1024 * 1024, step=5)
+
+# Music files read into memory by a Prefetcher, keyed by filename.
+music_cache = AssetCache(16 * 1024 * 1024)
+
+# The AssetArchive assets are read from, if any (see use_archive).
+archive = None
+
+def use_archive(path="assets.pak"):
+    """Reads assets from the archive at path from now on, falling back to
+    the loose files for anything it doesn't have. Returns False (and keeps
+    using loose files only) if there is no archive there.
+    """
+    global archive
+    if not os.path.exists(path):
+        return False
+    if archive is not None:
+        archive.close()
+    archive = AssetArchive(path)
+    return True
+
+# A SpritePool for each class of sprite pooled, by class.
+_pools = {}
+
+def get_pool(cls):
+    """Returns the SpritePool of the given class of sprite, made the first
+    time it is asked for. E.g. games.get_pool(Explosion).acquire(x, y)
+    """
+    pool = _pools.get(cls)
+    if pool is None:
+        pool = _pools[cls] = SpritePool(cls)
+    return pool
+
+def pool_stats():
+    """Returns {class name: (hits, misses, free sprites)} for every pool."""
+    return dict([(cls.__name__, (pool.hits, pool.misses, len(pool)))
+                 for (cls, pool) in _pools.items()])
+
+# Fonts, by (font file, size); opening one reads and parses the file.
+_fonts = {}
+
+def get_font(filename, size):
+    """Returns the pygame.font.Font for a font file (None for pygame's
+    default font) at a size. It is opened the first time only.
+    """
+    key = (filename, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(filename, size)
+    return font
+
+# Text rendered by render_text, keyed by (value, size, color, antialias).
+text_cache = AssetCache(2 * 1024 * 1024)
+
+def render_text(value, size, color, antialias=True):
+    """Returns a surface with the value written on it in pygame's default
+    font, as Text shows it. The same text in the same size and color is
+    only rendered once (see text_cache); don't draw on the surface.
+    """
+    key = (str(value), size, tuple(color), bool(antialias))
+    surface = text_cache.get(key)
+    if surface is None:
+        surface = get_font(None, size).render(key[0], antialias, color)
+        text_cache.put(key, surface, surface_size(surface))
+    return surface
+
+# Digit glyphs used by Counter, by (size, color).
+_counter_glyphs = {}
+
+def _digit_glyphs(size, color):
+    key = (size, tuple(color))
+    glyphs = _counter_glyphs.get(key)
+    if glyphs is None:
+        glyphs = _counter_glyphs[key] = {}
+        font = get_font(None, size)
+        for char in "0123456789-":
+            glyph = font.render(char, True, color)
+            # Copied into a Counter's surface as they are, alpha and all,
+            # rather than blended (they never overlap).
+            glyph.set_alpha(None)
+            glyphs[char] = glyph
+    return glyphs
+
+def load_manifest(filename):
+    """Returns the non-empty lines of a text manifest (such as a list of
+    image files), read from the archive if possible.
+    """
+    text = None
+    if archive is not None:
+        text = archive.text(filename)
+    if text is None:
+        manifest = open(filename, "r")
+        text = manifest.read()
+        manifest.close()
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def surface_size(surface):
+    """Returns the number of bytes used by the surface's pixels."""
+    return surface.get_pitch() * surface.get_height()
+
 def load_image(filename, transparent=True): 
     """Loads an image, prepares it for play. Returns a pygame.Surface object 
     which you can give as the "image" parameter to Sprite. 
+
+    Images are cached (see image_cache), so loading the same file again
+    returns the very same surface without touching the disk. Don't draw
+    on it; make a copy first.
  
     filename -- the filename of the image to load 
     transparent -- whether the background of the image should be transparent. 
@@ -916,14 +2789,405 @@ def load_image(filename, transparent=True):
                    The background color is taken as the color of the pixel 
                    at (0,0) in the image. 
     """ 
+    key = (filename, bool(transparent))
+    surface = image_cache.get(key)
+    if surface is None:
+        surface = _decode_image(filename, transparent)
+        _track(key, surface)
+        image_cache.put(key, surface, surface_size(surface))
+    return surface
+
+def _decode_image(filename, transparent):
+    surface = None
+    if archive is not None:
+        surface = archive.image(filename, transparent)
+    if surface is None:
+        surface = _prepare_image(_read_image(filename), transparent)
+    return surface
+
+def _read_image(filename):
+    # Decodes the file; safe to call from a worker thread.
     try: 
-        surface = pygame.image.load(filename) 
+        return pygame.image.load(filename) 
     except pygame.error: 
         raise GamesError('Could not load image "%s" %s'%(filename, pygame.get_error())) 
-    if transparent: 
-        corner = surface.get_at((0, 0)) 
-        surface.set_colorkey(corner, RLEACCEL) 
-    return surface.convert()
+
+def _prepare_image(surface, transparent):
+    # Converts to the display's format; only call from the main thread.
+    kind = analyze_image(surface, transparent)
+    if kind == "alpha":
+        return _apply_format(surface, kind)
+    if LOW_MEMORY:
+        surface = _reduce_depth(surface, kind == "colorkey")
+    else:
+        surface = surface.convert()
+    if kind == "opaque":
+        return _apply_format(surface, kind)
+    # Taken after the conversion, so it matches a converted pixel exactly.
+    corner = surface.get_at((0, 0))
+    return _apply_format(surface, kind, corner)
+
+def _reduce_depth(surface, colorkeyed):
+    # Low-memory mode: palettized images stay palettized (8 bits per
+    # pixel), everything else is stored in 16 bits, at the cost of a
+    # conversion to the display's format on every blit and slightly
+    # coarser color. Colorkeyed images where that would turn some pixels
+    # into the colorkey color (making them vanish) keep their full depth.
+    if surface.get_bitsize() == 8:
+        return surface
+    reduced = surface.convert(16)
+    if colorkeyed:
+        full = surface.convert()
+        if _corner_pixels(reduced) != _corner_pixels(full):
+            return full
+    return reduced
+
+def _corner_pixels(surface):
+    # How many pixels have the color of the top left one.
+    surface.set_colorkey(surface.get_at((0, 0)))
+    (width, height) = surface.get_size()
+    count = width * height - pygame.mask.from_surface(surface).count()
+    surface.set_colorkey(None)
+    return count
+
+# How each kind of image (see analyze_image) can be stored, and so
+# blitted: with no transparency at all ("plain"), with a colorkey (with
+# or without RLE acceleration) or with per-pixel alpha (likewise).
+BLIT_FORMATS = {"opaque": ("plain", "alpha"),
+                "colorkey": ("colorkey_rle", "colorkey", "alpha"),
+                "alpha": ("alpha", "alpha_rle")}
+
+# The format each kind of image is stored in when loaded. These defaults
+# are replaced by the fastest ones on this display by calibrate_formats().
+blit_formats = {"opaque": "plain",
+                "colorkey": "colorkey_rle",
+                "alpha": "alpha"}
+
+def analyze_image(surface, transparent):
+    """Returns the kind of image a freshly loaded surface is:
+
+    "opaque" -- not transparent, so it needs no colorkey
+    "colorkey" -- transparent where it has the color of its top left pixel
+    "alpha" -- transparent through per-pixel alpha (an alpha channel that
+               is opaque everywhere doesn't count: it is dropped)
+    """
+    if not transparent:
+        return "opaque"
+    if surface.get_flags() & SRCALPHA:
+        (width, height) = surface.get_size()
+        if pygame.mask.from_surface(surface, 254).count() < width * height:
+            return "alpha"
+    return "colorkey"
+
+def _apply_format(surface, kind, colorkey=None):
+    # Stores an image of the given kind in blit_formats[kind]. The surface
+    # must already be in the display's format, except for "alpha" images.
+    format = blit_formats[kind]
+    if LOW_MEMORY and kind != "alpha" and format.startswith("alpha"):
+        # Per-pixel alpha would mean 32 bits per pixel again.
+        format = BLIT_FORMATS[kind][0]
+    if format.startswith("colorkey"):
+        surface.set_colorkey(colorkey, format == "colorkey_rle" and RLEACCEL or 0)
+    elif format.startswith("alpha"):
+        # Only a colorkeyed image has pixels to make transparent.
+        if kind == "colorkey" and colorkey is not None:
+            surface.set_colorkey(colorkey)
+        surface = surface.convert_alpha()
+        if format == "alpha_rle":
+            surface.set_alpha(255, RLEACCEL)
+    return surface
+
+def calibrate_formats(size=96, blits=300):
+    """Times blits of each kind of image, stored in each of the formats it
+    can be stored in (see BLIT_FORMATS), onto a copy of the display, and
+    makes the fastest the one used from now on (see blit_formats). Call
+    it after init() and before loading images: images already loaded keep
+    their format.
+
+    Returns a dict of kind -> {format: microseconds per blit}.
+    """
+    target = pygame.display.get_surface().copy()
+    positions = [((n * 37) % (target.get_width() - size),
+                  (n * 53) % (target.get_height() - size)) for n in range(blits)]
+    timings = {}
+    for kind in sorted(BLIT_FORMATS):
+        timings[kind] = {}
+        for format in BLIT_FORMATS[kind]:
+            blit_formats[kind] = format
+            image = _prepare_image(_calibration_image(kind, size), kind != "opaque")
+            sequence = [(image, position) for position in positions]
+            start = time.perf_counter()
+            blit_all(target, sequence)
+            timings[kind][format] = (time.perf_counter() - start) * 1e6 / blits
+        blit_formats[kind] = min(timings[kind], key=timings[kind].get)
+    return timings
+
+def _calibration_image(kind, size):
+    # A round sprite on a square background, like most of the games' images.
+    flags = kind == "alpha" and SRCALPHA or 0
+    image = pygame.Surface((size, size), flags, 32)
+    image.fill((239, 228, 176, kind == "alpha" and 0 or 255))
+    if kind == "alpha":
+        # A soft edge, so the alpha is really needed.
+        pygame.draw.circle(image, (200, 40, 40, 128), (size // 2, size // 2), size // 2 - 2)
+    pygame.draw.circle(image, (200, 40, 40, 255), (size // 2, size // 2), size // 3)
+    return image
+
+def load_atlas(filename):
+    """Loads a sprite sheet made by build_atlas.py, along with its frame
+    table. Returns an Atlas; its frames can be given as the "image"
+    parameter to Sprite, and the Atlas itself (or a list of its frames)
+    to Animation.
+
+    Atlases are cached along with the images in image_cache.
+    """
+    key = (filename, "atlas")
+    atlas = image_cache.get(key)
+    if atlas is None:
+        atlas = _make_atlas(filename, _decode_image(filename, False))
+    return atlas
+
+def _make_atlas(filename, sheet):
+    frames = []
+    for line in load_manifest(_atlas_table(filename)):
+        (name, x, y, width, height) = line.split()
+        frames.append((name, pygame.Rect(int(x), int(y), int(width), int(height))))
+    atlas = Atlas(sheet, frames)
+    _track((filename, "atlas"), atlas)
+    image_cache.put((filename, "atlas"), atlas, surface_size(sheet))
+    return atlas
+
+def preload_assets(manifest, workers=4):
+    """Loads every asset in a manifest (see utility/assets.py) ahead of
+    time: images and atlases into image_cache, sounds into sound_bank.
+    Anything already loaded is skipped. Music is streamed from the disk
+    as it plays, so it is left to the Prefetcher.
+
+    The files are decoded by a pool of worker threads (pygame lets go of
+    the interpreter while decoding); only the conversion of images to
+    the display's format is done here, on the calling thread, since the
+    display must not be touched from elsewhere. Assets found in the
+    asset archive are only a copy away, so they are loaded here as well.
+
+    manifest -- a dict with any of the keys "images" (transparent),
+                "backgrounds" (opaque images), "atlases", "sounds" and
+                "music", each a sequence of filenames
+    workers -- the number of decoding threads. With 1 or less, every
+               asset is loaded on the calling thread instead.
+    """
+    keys = [key for key in _manifest_keys(manifest)
+            if key[1] != "music" and not _is_loaded(key)]
+
+    if workers <= 1:
+        for key in keys:
+            _load_asset(key)
+        return
+
+    for key in [key for key in keys if _archived(key)]:
+        keys.remove(key)
+        _load_asset(key)
+
+    pool = concurrent.futures.ThreadPoolExecutor(workers)
+    try:
+        jobs = [(key, pool.submit(_read_asset, key)) for key in keys]
+        for (key, job) in jobs:
+            _store_asset(key, job.result())
+    finally:
+        pool.shutdown()
+
+# An asset is named by a (filename, kind) key, where kind is True or
+# False for a transparent or opaque image (the same keys image_cache
+# uses), or "atlas", "sound" or "music".
+
+def _manifest_keys(manifest):
+    return ([(name, True) for name in manifest.get("images", ())] +
+            [(name, False) for name in manifest.get("backgrounds", ())] +
+            [(name, "atlas") for name in manifest.get("atlases", ())] +
+            [(name, "sound") for name in manifest.get("sounds", ())] +
+            [(name, "music") for name in manifest.get("music", ())])
+
+def _archived(key):
+    # Whether the asset is loaded from the archive (music never is).
+    return archive is not None and key[1] != "music" and key[0] in archive
+
+def _is_loaded(key):
+    (filename, kind) = key
+    if kind == "sound":
+        return filename in sound_bank
+    if kind == "music":
+        return filename in music_cache
+    return key in image_cache
+
+def _load_asset(key):
+    (filename, kind) = key
+    if kind == "atlas":
+        load_atlas(filename)
+    elif kind == "sound":
+        sound_bank.load(filename)
+    elif kind == "music":
+        _store_asset(key, _read_asset(key))
+    else:
+        load_image(filename, kind)
+
+def _read_asset(key):
+    # The part of loading an asset that is safe on a worker thread.
+    (filename, kind) = key
+    if kind == "sound":
+        return sound_bank._decode(filename)
+    if kind == "music":
+        music = open(filename, "rb")
+        data = music.read()
+        music.close()
+        return data
+    return _read_image(filename)
+
+def _store_asset(key, data):
+    # Finishes loading what _read_asset read; main thread only.
+    (filename, kind) = key
+    if kind == "sound":
+        (sound, decode_time) = data
+        sound_bank._store(filename, sound, decode_time)
+    elif kind == "music":
+        music_cache.put(filename, data, len(data))
+    elif kind == "atlas":
+        _make_atlas(filename, _prepare_image(data, False))
+    else:
+        surface = _prepare_image(data, kind)
+        _track(key, surface)
+        image_cache.put(key, surface, surface_size(surface))
+
+# Every image, atlas and sound loaded, by asset key, for as long as it is
+# in memory: in a cache, or referenced by a game (e.g. in a class body)
+# after the cache has let go of it.
+_live_assets = weakref.WeakValueDictionary()
+
+def _track(key, asset):
+    _live_assets[key] = asset
+
+def asset_memory():
+    """Returns a dict of (filename, kind) -> bytes, for every asset that
+    is still in memory. kind is True or False for a transparent or opaque
+    image, or "atlas", "sound" or "music". Only pixels and sample data
+    are counted.
+    """
+    sizes = {}
+    for (key, asset) in list(_live_assets.items()):
+        if key[1] == "sound":
+            sizes[key] = sound_size(asset)
+        elif key[1] == "atlas":
+            sizes[key] = surface_size(asset.sheet)
+        else:
+            sizes[key] = surface_size(asset)
+    for (filename, data, size) in music_cache.items():
+        sizes[(filename, "music")] = size
+    return sizes
+
+def memory_report(groups=None):
+    """Returns a report (as text) of the memory held by assets: each
+    asset, the total for each group of assets, and the totals for
+    surfaces, sounds and music.
+
+    groups -- a dict of name -> manifest (see utility/assets.py), e.g.
+              one per game. An asset may be in several groups.
+    """
+    sizes = asset_memory()
+    lines = ["%10s  %-8s %s" % ("bytes", "kind", "asset")]
+    for key in sorted(sizes, key=lambda key: (-sizes[key], key[0])):
+        kind = key[1]
+        if kind in (True, False):
+            kind = kind and "image" or "opaque"
+        lines.append("%10d  %-8s %s" % (sizes[key], kind, key[0]))
+
+    if groups:
+        lines.append("")
+        for name in sorted(groups):
+            keys = _manifest_keys(groups[name])
+            lines.append("%10d  %-8s %s" % (sum([sizes.get(key, 0) for key in keys]),
+                                            "group", name))
+
+    totals = {"surfaces": 0, "sounds": 0, "music": 0}
+    for (key, size) in sizes.items():
+        if key[1] == "sound":
+            totals["sounds"] += size
+        elif key[1] == "music":
+            totals["music"] += size
+        else:
+            totals["surfaces"] += size
+    lines.append("")
+    for name in ("surfaces", "sounds", "music"):
+        lines.append("%10d  %-8s %s" % (totals[name], "total", name))
+    lines.append("%10d  %-8s %s" % (sum(totals.values()), "total", "all assets"))
+    return "\n".join(lines) + "\n"
+
+def _file_size(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+def preload_images(filenames, transparent=True):
+    """Loads a number of images into the cache ahead of time."""
+    for filename in filenames:
+        if (filename, bool(transparent)) not in image_cache:
+            load_image(filename, transparent)
+
+def evict_image(filename, transparent=None):
+    """Drops an image from the cache. With transparent left as None, both
+    the transparent and the opaque versions (and the atlas, if it is a
+    sprite sheet) are dropped.
+    """
+    if transparent is None:
+        image_cache.evict((filename, True))
+        image_cache.evict((filename, False))
+        image_cache.evict((filename, "atlas"))
+    else:
+        image_cache.evict((filename, bool(transparent)))
+
+# Collision masks, keyed by surface and kept for as long as the surface
+# itself is alive (this covers the rotated copies made by Sprite._rotate).
+_masks = weakref.WeakKeyDictionary()
+
+def get_mask(surface):
+    """Returns the pygame.mask.Mask of the surface's opaque pixels. It is
+    built the first time it is asked for and cached after that.
+    """
+    mask = _masks.get(surface)
+    if mask is None:
+        mask = _masks[surface] = pygame.mask.from_surface(surface)
+    return mask
+
+if hasattr(pygame.Surface, "blits"):
+    def blit_all(target, sequence):
+        """Blits a sequence of (source, dest) or (source, dest, area)
+        tuples onto target, in order, with one call into pygame.
+        """
+        target.blits(sequence, 0)
+else:
+    def blit_all(target, sequence):
+        # Surface.blits only exists from pygame 1.9.4 on.
+        for blit_args in sequence:
+            target.blit(*blit_args)
+
+def merge_rects(rects, distance=0):
+    """Merges overlapping rectangles until none of them overlap. Returns
+    a new list of pygame.Rect objects covering the same area (and maybe
+    a little more). Empty rectangles are dropped.
+
+    distance -- rectangles less than this many pixels apart are merged
+                as well. Defaults to 0 (only overlapping ones).
+    """
+    merged = []
+    grow = 2 * distance
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        if not rect.width or not rect.height:
+            continue
+        index = rect.inflate(grow, grow).collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.inflate(grow, grow).collidelist(merged)
+        merged.append(rect)
+    return merged
 
 def scale_image(image, x_scale, y_scale=None):
     if y_scale is None: y_scale = x_scale
@@ -936,23 +3200,57 @@ def load_animation(filenames, transparent=1):
     """
     Loads a number of files.  Receives file names.  Returns corresponding file objects
     needed by the Animation constructor.
+    Also receives an Atlas, in which case its frames are returned (in table order).
     """
-    def _(name, transparent=transparent):
-        try: surface = pygame.image.load(name)
-        except pygame.error:
-            raise GamesError('Could not load animation frame "%s": %s' % (
-                name, pygame.get_error()))
-        if transparent:
-            surface.set_colorkey(surface.get_at((0,0)), RLEACCEL)
-            return surface.convert()
-    files = list(map(_, filenames))
-    return files
+    if isinstance(filenames, Atlas):
+        return filenames.images()
+    return [load_image(name, transparent) for name in filenames]
+
+# Frame sets made by load_frames, for as long as something (an Animation,
+# a class body...) is using them.
+_frame_sets = weakref.WeakValueDictionary()
+
+def load_frames(frames, durations=1, transparent=1):
+    """
+    Returns a FrameSet of the given frames: a FrameSet (returned as it
+    is), an Atlas (every frame, in table order), or a list of file names
+    or of images. Asking again for the same frames and durations returns
+    the same FrameSet, without loading anything.
+
+    durations -- ticks each frame is shown for: one number for every
+                 frame, or one per frame.
+    """
+    if isinstance(frames, FrameSet):
+        return frames
+    if not isinstance(durations, (int, float)):
+        durations = tuple(durations)
+    if isinstance(frames, Atlas):
+        key = (frames, durations)
+    else:
+        key = (tuple(frames), transparent, durations)
+    frame_set = _frame_sets.get(key)
+    if frame_set is None:
+        images = frames
+        if isinstance(frames, Atlas) or (frames and type(frames[0]) is type("")):
+            images = load_animation(frames, transparent)
+        frame_set = FrameSet(images, durations)
+        _frame_sets[key] = frame_set
+    return frame_set
  
+# Every sound loaded by load_sound, decoded once and shared.
+sound_bank = SoundBank()
+
+def sound_size(sound):
+    """Returns the number of bytes of sample data held by a Sound."""
+    frequency, format, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency) * channels * (abs(format) // 8)
+
 def load_sound(filename): 
     """ 
-    Load a sound file, returning a Sound object. 
+    Load a sound file, returning a Sound object. The file is only decoded
+    the first time; after that the same Sound is returned (see sound_bank).
     """ 
-    return pygame.mixer.Sound(filename)
+    return sound_bank.load(filename)
 
 
 ############################################################################### 
@@ -0,0 +1,64 @@
+#/usr/bin/env python
+#
+# Game Registry
+#
+# Every game PyArcade can launch: its title, the module and class
+# that run it, the file its high scores are kept in and the manifest
+# of assets it uses (see assets.py).
+#
+# A game's module is only imported the first time the game is
+# launched, since importing it loads all of its images and sounds.
+# The menu and the score screen only need the titles, so adding a
+# game here doesn't make the arcade any slower to start.
+#
+# E.g. to play Save the Phone:
+#
+# registry.get(constants.PHONE).launch()
+
+"""The games PyArcade can launch."""
+
+import importlib
+
+from utility import constants, assets
+
+
+class GameEntry(object):
+    """One of the arcade's games."""
+    def __init__(self, game_id, title, module, class_name, score_file, manifest):
+        """
+        game_id -- the menu option for the game (from constants.py)
+        title -- the name shown on the menu and the score screen
+        module -- the name of the module the game lives in
+        class_name -- the class in that module that runs the game
+        score_file -- the file its high scores are kept in
+        manifest -- the assets it loads (from assets.py)
+        """
+        self.game_id = game_id
+        self.title = title
+        self.module = module
+        self.class_name = class_name
+        self.score_file = score_file
+        self.manifest = manifest
+
+    def load(self):
+        """Import the game (and with it, its assets). Return its class."""
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+    def launch(self):
+        """Play the game until it's over."""
+        self.load()().start()
+
+
+GAMES = (GameEntry(constants.PONG, "Pong", "pong", "Pong",
+                   "utility/pong_score.txt", assets.PONG),
+         GameEntry(constants.SIMON, "Simon Says", "simon", "Simon",
+                   "utility/simon_score.txt", assets.SIMON),
+         GameEntry(constants.PHONE, "Save the Phone", "phone", "Game",
+                   "utility/phone_score.txt", assets.PHONE))
+
+_by_id = dict([(game.game_id, game) for game in GAMES])
+
+
+def get(game_id):
+    """Return the GameEntry for a menu option, or None if it isn't a game."""
+    return _by_id.get(game_id)
@@ -0,0 +1,130 @@
+#/usr/bin/env python
+#
+# Startup Tracer
+#
+# Times each phase of PyArcade's startup (imports, display and mixer
+# init, asset loads, splash screens...) as named spans, and the time
+# until the menu first accepts input ("time to interactive").
+#
+# E.g.
+#
+# with startup.Span("display init"):
+#     games.init(...)
+#
+# Set PYARCADE_STARTUP_REPORT to a file name (or "-" for the console)
+# to have the timeline written there once the menu is interactive.
+#
+# Set PYARCADE_FAST_BOOT=1 for a cabinet that must come back quickly
+# after a reboot: splash screens only stay up while assets are still
+# loading, instead of for a fixed time.
+
+"""Startup timeline tracer and fast-boot switch."""
+
+import os
+
+import sys
+
+import time
+
+FAST_BOOT = os.environ.get("PYARCADE_FAST_BOOT", "") not in ("", "0")
+
+REPORT = os.environ.get("PYARCADE_STARTUP_REPORT")
+
+# Times are measured from when this module is first imported (main.py
+# imports it before anything else).
+_origin = time.perf_counter()
+
+# [name, start, end, nesting depth, waiting], in the order spans began.
+_spans = []
+
+_depth = 0
+
+_interactive = None
+
+
+class Span(object):
+    """A named phase of startup, timed by a with statement."""
+    def __init__(self, name, waiting=False):
+        """
+        name -- what the phase is
+        waiting -- true if the phase is spent waiting (on the player, or
+                   on a splash screen) rather than working. Waiting spans
+                   shouldn't be nested in each other.
+        """
+        self.name = name
+        self.waiting = waiting
+
+    def __enter__(self):
+        global _depth
+        # Only startup is traced.
+        if _interactive is not None:
+            self._record = None
+            return self
+        self._record = [self.name, time.perf_counter(), None, _depth, self.waiting]
+        _spans.append(self._record)
+        _depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        global _depth
+        if self._record is None:
+            return False
+        _depth -= 1
+        self._record[2] = time.perf_counter()
+        return False
+
+
+def interactive():
+    """
+    Call once the menu accepts input. The first call records the time to
+    interactive (and writes the report, if one was asked for); later
+    calls do nothing.
+    """
+    global _interactive
+    if _interactive is not None:
+        return
+    _interactive = time.perf_counter()
+    if REPORT:
+        write_report(REPORT)
+
+
+def time_to_interactive():
+    """Return the time to interactive in milliseconds, or None if not reached."""
+    if _interactive is None:
+        return None
+    return (_interactive - _origin) * 1000
+
+
+def report():
+    """Return the startup timeline as text."""
+    lines = ["PyArcade startup timeline (ms)%s" % (FAST_BOOT and ", fast boot" or ""),
+             "%9s %9s  %s" % ("start", "duration", "span")]
+    waiting = 0.0
+    for (name, start, end, depth, is_waiting) in _spans:
+        if end is None:
+            lines.append("%9.1f %9s  %s%s" % ((start - _origin) * 1000, "...",
+                                              "  " * depth, name))
+            continue
+        duration = (end - start) * 1000
+        if is_waiting:
+            waiting += duration
+        lines.append("%9.1f %9.1f  %s%s%s" % ((start - _origin) * 1000, duration,
+                                              "  " * depth, name,
+                                              is_waiting and " (waiting)" or ""))
+    tti = time_to_interactive()
+    if tti is None:
+        lines.append("The menu has not accepted input yet.")
+    else:
+        lines.append("Time to interactive: %.1f ms (%.1f ms without waiting)" %
+                     (tti, tti - waiting))
+    return "\n".join(lines) + "\n"
+
+
+def write_report(path):
+    """Write the report to a file, or to the console if path is "-"."""
+    if path == "-":
+        sys.stdout.write(report())
+        return
+    report_file = open(path, "w")
+    report_file.write(report())
+    report_file.close()